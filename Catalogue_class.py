@@ -0,0 +1,78 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import re
+import sys
+import numpy as np
+
+#%% Key catalogue
+# All keys in all logs with a small id for every key, shared by all logs
+# Key strings are interned so every log uses the same string object for a key,
+# the unit is parsed once when the key is added: "CAM#3 FAST SEARCH time (ms)" has unit "ms"
+class KeyCatalogue:
+    def __init__(self):
+        self.keys = []      # Key for every id
+        self.ids = {}       # Id for every key
+        self.units = []     # Unit for every id, "" if key has no unit
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.ids
+
+    # Id for key, key is added if it is new
+    def intern(self, key):
+        if key in self.ids:
+            return self.ids[key]
+
+        key = sys.intern(key)
+        self.ids[key] = len(self.keys)
+        self.keys.append(key)
+        self.units.append(self.parse_unit(key))
+        return self.ids[key]
+
+    # Unit in parentheses at the end of key, "" if key has no unit
+    @staticmethod
+    def parse_unit(key):
+        unit = re.search(r"\(([^()]*)\)$", key)
+        return unit.group(1) if unit else ""
+
+    def intern_keys(self, keys):
+        return np.array([self.intern(key) for key in keys], dtype=np.int32)
+
+    # Same dict with the catalogue string for every key
+    def intern_dict(self, data):
+        return {self.keys[self.intern(key)]: value for key, value in data.items()}
+
+#%% return data
+    def return_key(self, id):
+        return self.keys[id]
+
+    # Unit of key, keys that are not in the catalogue are not added
+    def return_unit(self, key):
+        if key in self.ids:
+            return self.units[self.ids[key]]
+        return self.parse_unit(key)
+
+    # Keys for ids sorted by name
+    def sorted_keys(self, ids):
+        return sorted(self.keys[id] for id in ids)
+
+# Catalogue shared by all logs
+CATALOGUE = KeyCatalogue()
@@ -16,26 +16,47 @@
 # along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
 
 #%% Standard modules
-import pickle
+import json
+import hashlib
 import datetime as dt
-import paramiko
 import os
-from tqdm import tqdm
 import shutil
 import subprocess
-from tabulate import tabulate
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+import time
+import threading
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 import numpy as np
 import configparser
+import csv
+import sys
+
+# paramiko, matplotlib, tabulate and tqdm are imported in the methods that use them
+# so commands that do not need them start faster
 
 #%% Custom modules
 from functions import user_acknowledge
 from functions import input_int
 from functions import input_str
+from functions import LRUCache
+from functions import compress_log
+from functions import COMPRESSION_EXTENSIONS
+from functions import INDEX_EXTENSION
+from functions import log_filenames
 
 #%% Classes
 from Log_class import Log
+from Log_class import import_log
+from Log_class import process_lines
+from Log_class import PARSER_VERSION
+from Log_class import AGGREGATION
+from Store_class import Store
+from Catalogue_class import CATALOGUE
+from Query_class import Query
+from Report_class import Report
+from Dataset_class import Dataset
 
 #%% Class def
 # Init properties
@@ -43,9 +64,12 @@ init_properties = {"keys": []}
 
 class Data:
 
-    def __init__(self):
+    # Status messages are printed to status_file, commands from the command line use stderr
+    # so data written to stdout can be redirected to a file
+    def __init__(self, status_file = None):
+        self.status_file = status_file or sys.stdout
         if __debug__:
-            print("\nDebug mode\n")
+            print("\nDebug mode\n", file=self.status_file)
 
         # Init variables
         config = configparser.ConfigParser()
@@ -55,79 +79,177 @@ class Data:
         self.ssh_user   = config['SSH']['user']
         self.ssh_pwd    = config['SSH']['password']
         self.ssh_folder = config['SSH']['folder']
+        self.ssh_port   = config['SSH'].getint('port', fallback=22)
+        self.ssh_wifi   = config['SSH'].get('wifi', fallback="ROStig")        # Empty skips WiFi check
+        self.ssh_transfers = config['SSH'].getint('transfers', fallback=4)    # Files downloaded at the same time
 
         self.general_log_filename = config['General']['log_filename']
         self.data_folder = config['General']['data_folder']
         # if __debug__:
         #     self.data_folder = "debug_" + self.data_folder
+
+        # Number of processes used when importing camera files, 0 uses all cores
+        self.import_workers = config['General'].getint('import_workers', fallback=1)
+        if self.import_workers == 0:
+            self.import_workers = os.cpu_count()
+
+        # How percentiles are calculated, see AGGREGATION in Log_class
+        self.aggregation = {"mode"        : config['General'].get('aggregation', fallback=AGGREGATION["mode"]),
+                            "exact_limit" : config['General'].getint('exact_limit', fallback=AGGREGATION["exact_limit"]),
+                            "accuracy"    : config['General'].getfloat('sketch_accuracy', fallback=AGGREGATION["accuracy"]),
+                            "outlier_extremes" : config['General'].getint('outlier_extremes', fallback=AGGREGATION["outlier_extremes"]),
+                            "outlier_samples"  : config['General'].getint('outlier_samples', fallback=AGGREGATION["outlier_samples"])}
+
+        # Compression of log files in archive, none, gzip or zstd
+        self.archive_compression = config['General'].get('archive_compression', fallback="gzip")
+
+        # Live view, keys are separated with ';' and live_folder can be used instead of SSH for testing
+        self.live_keys     = [key.strip() for key in config['General'].get('live_keys', fallback="Loop, Duration (ms);Framerate (Hz)").split(";")]
+        self.live_window   = config['General'].getint('live_window', fallback=2000)
+        self.live_interval = config['General'].getfloat('live_interval', fallback=1.0)
+        self.live_folder   = config['General'].get('live_folder', fallback="")
+
+        # Reports are saved in report_folder in data folder, as png or svg
+        self.report_folder = config['General'].get('report_folder', fallback="report")
+        self.report_format = config['General'].get('report_format', fallback="png")
+
+        # Datasets for pandas or polars are saved in dataset_folder in data folder, as parquet or arrow
+        self.dataset_folder = config['General'].get('dataset_folder', fallback="dataset")
+        self.dataset_format = config['General'].get('dataset_format', fallback="parquet")
+
+        # Memory used for timelines in MB
+        Log.timeline_cache = LRUCache(config['General'].getint('timeline_cache_mb', fallback=256))
         
         filepath = os.path.realpath(__file__)
         folderpath = os.path.dirname(filepath)
         self.data_folder = os.path.join(folderpath, self.data_folder)
 
         self.archive_folder = os.path.join(self.data_folder, "archive")
-        self.data_filepath  = os.path.join(self.data_folder, "logs")
+        self.data_filepath  = os.path.join(self.data_folder, "logs")     # Old file with all logs in one pickle
+        self.store_folder   = os.path.join(self.data_folder, "store")
+        self.manifest_filepath = os.path.join(self.data_folder, "manifest.json")
         self.backup_folder  = os.path.join(self.data_folder, "backup")
         self.input_folder   = os.path.join(self.archive_folder, "input")
+        self.report_folder  = os.path.join(self.data_folder, self.report_folder)
+        self.dataset_folder = os.path.join(self.data_folder, self.dataset_folder)
 
         # Command lists
         self.commands = {"fetch"    : self.fetch_new_logs,
+                         "live"     : self.live_view,
                          "list"     : self.display_data,
-                         "reimport" : self.reimport_all}
+                         "query"    : self.query_logs,
+                         "report"   : self.report_logs,
+                         "export dataset" : self.export_dataset,
+                         "reimport" : self.reimport_all,
+                         "migrate"  : self.migrate_store,
+                         "compress archive" : self.compress_archive}
 
         debug_commands = {"ssh"     : self.copy_files_to_local,
-                          "import"  : self.read_data}
+                          "import"  : self.read_data,
+                          "full reimport" : lambda: self.reimport_all(True)}
         if __debug__:
             self.commands["debug"] = debug_commands
 
-        print("Working directory:", os.path.abspath(self.data_folder), "\n")
+        print("Working directory:", os.path.abspath(self.data_folder), "\n", file=self.status_file)
         # Open file, this also creates a backup
         self.openFile()
             
-        print(f"{len(self.logs)} logs imported\n")
+        print(f"{len(self.store)} logs imported\n", file=self.status_file)
 
     def returnCommands(self):
         return self.commands
 
 #%% Data handling
-    # Open and close file
+    # Open store, only the index is read, logs are loaded when they are used
     def openFile(self):
+        self.store = Store(self.store_folder)
+        if self.store.exists():
+            self.store.open()
+
+        # Move logs from old file to store
+        elif os.path.exists(self.data_filepath):
+            print("Moving logs to", self.store_folder, file=self.status_file)
+            self.store.import_legacy(self.data_filepath)
+
+        # If file could not be read, create new, scripts always create new
+        elif not sys.stdin.isatty() or input("Could not read file, create new? (y/n): ") == "y":
+            self.store.properties = init_properties
+            self.store.save()
+            print("\n", file=self.status_file)
+        else: 
+            raise SystemExit()
+
+    # Rewrites logs pickled by older versions in the numpy format
+    def migrate_store(self):
+        count = self.store.migrate()
+        print(f"{count} logs migrated")
+
+    # Manifest with fingerprints of the files in every archive folder, used by reimport_all
+    def openManifest(self):
         try:
-            with open(self.data_filepath, 'rb') as file:
-                data = pickle.load(file)
-                self.logs = data[0]
-                self.properties = data[1]
-        except FileNotFoundError:
-            # If file could not be read, create new
-            if input("Could not read file, create new? (y/n): ") == "y":
-                self.logs = []
-                self.properties = init_properties
-                self.saveFile()
-                print("\n")
-            else: 
-                raise SystemExit()
-    def saveFile(self):
-        data = [self.logs, self.properties]
-        with open(self.data_filepath, 'wb') as file:
-            pickle.dump(data, file)
+            with open(self.manifest_filepath, 'r', encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    def saveManifest(self, manifest):
+        with open(self.manifest_filepath, 'w', encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1)
+
+    # Size, mtime and hash of all files in folder
+    # The hash is reused from previous fingerprint if size and mtime are unchanged
+    def fingerprint_folder(self, folderpath, previous = None):
+        if previous is None or previous.get("parser_version") != PARSER_VERSION:
+            previous_files = {}
+        else:
+            previous_files = previous["files"]
+
+        files = {}
+        for filename in sorted(log_filenames(folderpath)):
+            stat = os.stat(os.path.join(folderpath, filename))
+            old = previous_files.get(filename)
+            if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+                digest = old["sha256"]
+            else:
+                with open(os.path.join(folderpath, filename), 'rb') as file:
+                    digest = hashlib.file_digest(file, "sha256").hexdigest()
+            files[filename] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+
+        return {"parser_version": PARSER_VERSION, "aggregation": self.aggregation, "files": files}
+
+    # True if parser version, aggregation and content of files are the same, mtime is ignored
+    def same_fingerprint(self, fingerprint, other):
+        if other is None or fingerprint["parser_version"] != other.get("parser_version"):
+            return False
+        if fingerprint["aggregation"] != other.get("aggregation"):
+            return False
+        content = {filename: (file["size"], file["sha256"]) for filename, file in fingerprint["files"].items()}
+        other_content = {filename: (file["size"], file["sha256"]) for filename, file in other["files"].items()}
+        return content == other_content
 
     # Copy files from ssh to local folder
-    def copy_files_to_local(self):
-        
+    # Files are downloaded in parallel with one SFTP channel per thread, files with same size and mtime are skipped
+    # If parse is True camera files are parsed while they are downloaded and the results are returned
+    # Returns True if the files could not be downloaded
+    def copy_files_to_local(self, parse = False):
+        from tqdm import tqdm
+
         # Checks if connected to right network
-        wifi = subprocess.check_output(['netsh', 'WLAN', 'show', 'interfaces'])
-        wifi_data = wifi.decode('utf-8')
-        
-        if not "ROStig" in wifi_data:
-            user_acknowledge("Not connected to ROStig WiFi!")
-            return True # Return True to exit callin function as well
+        if self.ssh_wifi:
+            wifi = subprocess.check_output(['netsh', 'WLAN', 'show', 'interfaces'])
+            wifi_data = wifi.decode('utf-8')
+            
+            if not self.ssh_wifi in wifi_data:
+                user_acknowledge(f"Not connected to {self.ssh_wifi} WiFi!")
+                return True # Return True to exit callin function as well
         
+        import paramiko
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
+        parsed = {}
         try:
             print("Connecting...")
-            ssh.connect(self.ssh_host, username=self.ssh_user, password=self.ssh_pwd)
+            ssh.connect(self.ssh_host, port=self.ssh_port, username=self.ssh_user, password=self.ssh_pwd)
             print("Success!")
 
             sftp = ssh.open_sftp()
@@ -136,87 +258,258 @@ class Data:
             os.makedirs(self.input_folder, exist_ok=True)
 
             # List files in the remote directory
-            remote_files = sftp.listdir(self.ssh_folder)
+            remote_files = [attributes for attributes in sftp.listdir_attr(self.ssh_folder) if not "exclude" in attributes.filename]
+            sftp.close()
 
             if not remote_files:
                 print("No log files found")
 
-            for log_file in tqdm(remote_files, desc="Downloading Logs"):
-                if "exclude" in log_file:
-                    continue
-                remote_path = os.path.join(self.ssh_folder, log_file)
-                local_path = os.path.join(self.input_folder, log_file)
-                sftp.get(remote_path, local_path)
-
-            sftp.close()
+            # Skip files that are already downloaded
+            downloads = []
+            for attributes in remote_files:
+                local_path = os.path.join(self.input_folder, attributes.filename)
+                if os.path.exists(local_path):
+                    stat = os.stat(local_path)
+                    if stat.st_size == attributes.st_size and int(stat.st_mtime) == attributes.st_mtime:
+                        continue
+                downloads.append(attributes)
+
+            start = time.perf_counter()
+            total_bytes = 0
+            channels = threading.local()
+            with ThreadPoolExecutor(max(1, self.ssh_transfers)) as executor:
+                results = executor.map(self.download_file, repeat(ssh), repeat(channels), downloads, repeat(parse))
+                for attributes, (size, result) in tqdm(zip(downloads, results), desc="Downloading Logs", total=len(downloads)):
+                    total_bytes += size
+                    if result is not None:
+                        parsed[attributes.filename] = result
+            seconds = time.perf_counter() - start
+
+            skipped = len(remote_files) - len(downloads)
+            print(f"{len(downloads)} files downloaded ({total_bytes / 1e6:.1f} MB at {total_bytes / 1e6 / max(seconds, 1e-9):.1f} MB/s), {skipped} unchanged files skipped")
         
         except paramiko.AuthenticationException:
             print("Authentication failed! Check credentials and SSH config.")
+            return True
         except Exception as e:
             print(f"Error: {e}")
+            return True
         finally:
             ssh.close()
 
-    # Import log data
-    def read_data(self, other_input_folder = None):
-        
-        # other input folder only used in reimport_all, so we check archive folder
-        if other_input_folder:
-            input_folder = other_input_folder
-            new_log = Log(input_folder, self.general_log_filename, False)
+        return parsed
+
+    # Downloads one file, every thread opens its own SFTP channel on the connection and reuses it
+    # Camera files are parsed while they are downloaded if parse is True
+    def download_file(self, ssh, channels, attributes, parse = False):
+        if not hasattr(channels, "sftp"):
+            channels.sftp = ssh.open_sftp()
+
+        remote_path = posixpath.join(self.ssh_folder, attributes.filename)
+        local_path = os.path.join(self.input_folder, attributes.filename)
+        result = None
+        if parse and attributes.filename != self.general_log_filename:
+            result = process_lines(self.stream_lines(channels.sftp, remote_path, local_path), self.aggregation)
         else:
-            input_folder = self.input_folder
+            channels.sftp.get(remote_path, local_path)
+
+        # Same mtime as remote file so it is skipped next time
+        os.utime(local_path, (attributes.st_atime, attributes.st_mtime))
+        return attributes.st_size, result
+
+    # Lines of remote file, the file is written to local_path as it is read
+    def stream_lines(self, sftp, remote_path, local_path, chunk_size = 1 << 20):
+        with sftp.open(remote_path, 'rb') as remote, open(local_path, 'wb') as local:
+            remote.prefetch()
+            remainder = b""
+            while True:
+                chunk = remote.read(chunk_size)
+                if not chunk:
+                    break
+                local.write(chunk)
+
+                # Only complete lines are decoded, the rest waits for next chunk
+                complete, _, remainder = (remainder + chunk).rpartition(b"\n")
+                if complete:
+                    yield from complete.decode("utf-8").split("\n")
+            if remainder:
+                yield remainder.decode("utf-8")
+
+    # Follows camera logs while GulliView is running
+    def live_view(self):
+        from Live_class import Live
+        live = Live(self.live_keys, self.general_log_filename, self.live_window, self.live_interval)
+
+        if self.live_folder:
+            live.follow_local(self.live_folder)
+            live.run()
+            return
+
+        import paramiko
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            print("Connecting...")
+            ssh.connect(self.ssh_host, port=self.ssh_port, username=self.ssh_user, password=self.ssh_pwd)
+            print("Success!")
+
+            sftp = ssh.open_sftp()
+            filenames = sftp.listdir(self.ssh_folder)
+            sftp.close()
+
+            live.follow_remote(ssh, self.ssh_folder, filenames)
+            print("Close plot window to stop")
+            live.run()
+        
+        except paramiko.AuthenticationException:
+            print("Authentication failed! Check credentials and SSH config.")
+        except Exception as e:
+            print(f"Error: {e}")
+        finally:
+            live.stop()
+            ssh.close()
 
-            if not os.path.exists(self.input_folder):
-                user_acknowledge("Input folder not found, this message should only be present in debug mode")
-                return
-            new_log = Log(input_folder, self.general_log_filename)
+    # Import log data, results has files that were parsed while downloading
+    # Returns True if there was nothing to import or the log was already imported
+    def read_data(self, results = None):
+        if not os.path.exists(self.input_folder):
+            user_acknowledge("Input folder not found, this message should only be present in debug mode")
+            return True
+        new_log = Log(self.input_folder, self.general_log_filename, workers=self.import_workers,
+                      aggregation=self.aggregation, results=results)
 
         # Get new folder name, it's path and it's archive path to be moved to
         new_name = new_log.return_folder_name()
         new_path = os.path.join(self.archive_folder, new_name)
 
-        # other input folder only used in reimport_all, so all files are already there så ignore this
-        if not other_input_folder:
-            # Check if log exists in archive
-            if os.path.exists(new_path):
-                user_acknowledge("Logs already imported, please delete input folder as this cannot be done by the program")
-                return
+        # Check if log exists in archive
+        if os.path.exists(new_path):
+            user_acknowledge("Logs already imported, please delete input folder as this cannot be done by the program")
+            return True
+
+        # Rename and move
+        os.rename(self.input_folder, new_path)
+        new_log.folderpath = new_path
+        self.compress_folder(new_path)
 
-        # Rename and move if not called by reimport_all
-        if not other_input_folder:
-            os.rename(self.input_folder, new_path)
+        # Add to store, older logs are not rewritten
+        self.store.append(new_log)
 
-        # Add to file and save
-        self.logs.append(new_log)
-        if not other_input_folder:
-            self.saveFile()
+        # Add to manifest so reimport_all does not import it again
+        manifest = self.openManifest()
+        manifest[new_name] = self.fingerprint_folder(new_path)
+        self.saveManifest(manifest)
 
     # copies files to local, creates new log object, archives logs
+    # Camera files are parsed while they are downloaded
+    # Returns True if logs could not be fetched
     def fetch_new_logs(self):
-        if self.copy_files_to_local():
+        results = self.copy_files_to_local(True)
+        if results is True:
+            return True
+        return self.read_data(results)
+
+    # Compresses camera logs in archive folder, general log is kept as text
+    # Returns number of bytes saved
+    def compress_folder(self, folderpath):
+        if self.archive_compression == "none":
+            return 0
+
+        saved = 0
+        for filename in log_filenames(folderpath):
+            filepath = os.path.join(folderpath, filename)
+            if filename == self.general_log_filename or filename.endswith(tuple(COMPRESSION_EXTENSIONS.values())):
+                continue
+            size = os.path.getsize(filepath)
+            saved += size - os.path.getsize(compress_log(filepath, self.archive_compression))
+
+            # Compressed files are not indexed
+            if os.path.exists(filepath + INDEX_EXTENSION):
+                os.remove(filepath + INDEX_EXTENSION)
+        return saved
+
+    # Compresses all archive folders, manifest is updated so unchanged logs are not reimported
+    def compress_archive(self):
+        from tqdm import tqdm
+        if self.archive_compression == "none":
+            user_acknowledge("Set archive_compression in config.ini to gzip or zstd to compress archive")
             return
-        self.read_data()
-
-    # imports all data from archive folder, if something has been updated
-    def reimport_all(self):
-        self.logs = []
-        self.properties = init_properties
-        filenames = os.listdir(self.archive_folder)
-        for folder_name in tqdm(filenames, desc="Reimporting files"):
-            filepath = os.path.join(self.archive_folder, folder_name)
-            self.read_data(filepath)
-        self.saveFile()
-        print(f"\n\n{len(self.logs)} logs reimported\n")
+
+        manifest = self.openManifest()
+        saved = 0
+        for folder_name in tqdm(sorted(os.listdir(self.archive_folder)), "Compressing archive"):
+            folderpath = os.path.join(self.archive_folder, folder_name)
+            previous = manifest.get(folder_name)
+            unchanged = self.same_fingerprint(self.fingerprint_folder(folderpath, previous), previous)
+
+            saved += self.compress_folder(folderpath)
+            if unchanged:
+                manifest[folder_name] = self.fingerprint_folder(folderpath)
+        self.saveManifest(manifest)
+
+        print(f"\n{saved / 1e6:.1f} MB saved\n")
+
+    # imports data from archive folder, only folders where files or parser version have changed are imported
+    # Every archive folder is imported in its own process if more than one worker is used
+    def reimport_all(self, full = False):
+        from tabulate import tabulate
+        from tqdm import tqdm
+        start = time.perf_counter()
+
+        # Logs that can be reused, archive folders are named after the log
+        old_names = set(self.store.return_names())
+        manifest = {} if full else self.openManifest()
+
+        # Sorted so the order of logs does not depend on the file system or on the workers
+        folder_names = sorted(os.listdir(self.archive_folder))
+        new_manifest = {}
+        changed = []
+        for folder_name in folder_names:
+            folderpath = os.path.join(self.archive_folder, folder_name)
+            previous = manifest.get(folder_name)
+            new_manifest[folder_name] = self.fingerprint_folder(folderpath, previous)
+            if not self.same_fingerprint(new_manifest[folder_name], previous) or not folder_name in old_names:
+                changed.append(folder_name)
+        folderpaths = [os.path.join(self.archive_folder, folder_name) for folder_name in changed]
+
+        if self.import_workers > 1 and len(folderpaths) > 1:
+            executor = ProcessPoolExecutor(min(self.import_workers, len(folderpaths)))
+            results = executor.map(import_log, folderpaths, repeat(self.general_log_filename), repeat(self.aggregation))
+        else:
+            executor = None
+            results = map(import_log, folderpaths, repeat(self.general_log_filename), repeat(self.aggregation))
+
+        timings = []
+        new_logs = {}
+        try:
+            for folder_name, (log, seconds) in tqdm(zip(changed, results), "Reimporting files", total=len(changed)):
+                new_logs[folder_name] = log
+                timings.append([folder_name, round(seconds, 2)])
+        finally:
+            if executor:
+                executor.shutdown()
+
+        # Logs are kept in folder order, unchanged logs are reused without loading them
+        if changed or old_names != set(folder_names):
+            self.store.properties = init_properties
+            self.store.update(folder_names, new_logs)
+        if new_manifest != manifest:
+            self.saveManifest(new_manifest)
+        total = time.perf_counter() - start
+
+        if timings:
+            print(tabulate(timings, ["Folder", "Import time (s)"], tablefmt='rounded_grid'))
+        print(f"\n\n{len(changed)} logs reimported and {len(self.store) - len(changed)} unchanged in {total:.2f} s\n")
 
 #%% Print data
     # Prints all imported logs with some attributes displayed
     def print_all(self, exclude = []):
+        from tabulate import tabulate
         grid = []
         headers = ["ID", "TIME", "VERSION", "COMMENT", "LIVE_FEED", "RECORDING_FOLDER"]
-        for i,log_object in enumerate(self.logs):
+        for i in range(len(self.store)):
 
-            general_log = log_object.return_attributes()
+            general_log = self.store.return_attributes(i)
 
             # Add id to first index in output list if it should not be excluded
             if i+1 in exclude:
@@ -239,21 +532,14 @@ class Data:
         
         print(tabulate(grid, headers, tablefmt='rounded_grid'))
 
-    # Can get more info from a specific log
-    def display_data(self):
-
-        # If there are no logs return
-        if len(self.logs) == 0:
-            return
-        
-        # Get ID for log to view
-        comp = []       # List for all Log objects
+    # Asks for IDs of logs until none is given, returns the IDs
+    def choose_logs(self):
         comp_ID = []    # List of IDs added
 
         while True:
             self.print_all(comp_ID)
             prompt = "Input ID to add to comparison (leave empty when done): "
-            ID = input_int(len(self.logs), prompt)
+            ID = input_int(len(self.store), prompt)
             if not ID:
                 break
 
@@ -262,19 +548,15 @@ class Data:
             
             else:
                 comp_ID.append(ID)
-                comp.append(self.logs[ID-1])
                 print(ID, "added to comparision!")
-        
-        # if no logs added to comparison, return
-        if comp == []:
-            return
+        return comp_ID
 
-        available_keys = []
+    # Asks for keys in any of the logs until none is given
+    def choose_keys(self, comp):
+        available_ids = set()
         for i in comp:
-            for key in i.return_keys():
-                if not key in available_keys:
-                    available_keys.append(key)
-            available_keys.sort()
+            available_ids.update(i.return_key_ids().tolist())
+        available_keys = CATALOGUE.sorted_keys(available_ids)
 
         keys = []
         while True:
@@ -284,20 +566,164 @@ class Data:
             
             keys.append(key)
             print(key, "added to comparision!")
+        return keys
+
+    # Can get more info from a specific log
+    def display_data(self):
+
+        # If there are no logs return
+        if len(self.store) == 0:
+            return
+        
+        # Get ID for log to view
+        comp = [self.store[ID-1] for ID in self.choose_logs()]     # List for all Log objects
         
+        # if no logs added to comparison, return
+        if comp == []:
+            return
+
+        keys = self.choose_keys(comp)
         if keys == []:
             return
         
-        modes = ["Box-plot", "Timeline"]
+        modes = ["Box-plot", "Timeline", "Stages"]
         mode = input_str(modes)
         
         if mode == modes[0]:
             self.display_combined(comp, keys)
         elif mode == modes[1]:
             self.display_timeline(comp, keys)
+        elif mode == modes[2]:
+            self.display_stages(comp, keys)
+
+    # Saves box plots and timelines of keys in logs with IDs as images in folderpath with an index.html,
+    # figures are drawn in parallel and figures of logs that did not change are reused
+    def create_report(self, ids, keys, folderpath = None, format = None, workers = None):
+        report = Report(self.store, folderpath or self.report_folder, format or self.report_format)
+        names = [self.store.return_names()[ID-1] for ID in ids]
+
+        start = time.time()
+        drawn, reused = report.render(names, keys, workers or self.import_workers)
+        print(f"{drawn} figures drawn and {reused} reused in {time.time() - start:.2f} s")
+        print("Report saved to", os.path.join(report.folderpath, "index.html"))
+
+    # Report from menu
+    def report_logs(self):
+        if len(self.store) == 0:
+            return
+        ids = self.choose_logs()
+        if ids == []:
+            return
+        keys = self.choose_keys([self.store[ID-1] for ID in ids])
+        if keys == []:
+            return
+        self.create_report(ids, keys)
+
+    # Table with percentiles of all cameras for keys matching a pattern in logs matching conditions
+    def query_logs(self):
+        from tabulate import tabulate
+        if len(self.store) == 0:
+            return
+        query = Query(self.store)
+
+        print("Conditions on general data separated by ',', for example: VERSION=VT25.1, FPS>=30, TIME>=2025-03-01")
+        text = input("Conditions (leave empty for all logs): ")
+        try:
+            conditions = [Query.parse_condition(condition) for condition in text.split(",") if condition.strip()]
+        except ValueError as e:
+            print(e)
+            return
+
+        print("Key patterns separated by ';', * matches any text, for example: Loop*;CAM#? GLOBAL*")
+        patterns = input("Key patterns (leave empty for all keys): ") or "*"
+
+        rows = query.select(conditions, patterns)
+        if rows == []:
+            print("No logs or keys match")
+            return
+        print(tabulate(rows, headers="keys", tablefmt='rounded_grid', floatfmt=".4g"))
+
+    # Writes percentiles for keys matching patterns in logs matching conditions to csv file,
+    # ids limits the logs to these IDs, filepath None writes to terminal
+    def export_table(self, conditions = [], patterns = "*", ids = None, filepath = None):
+        rows = Query(self.store).select(conditions, patterns)
+        if ids:
+            rows = [row for row in rows if row["ID"] in ids]
+
+        file = open(filepath, "w", newline="", encoding="utf-8") if filepath else sys.stdout
+        try:
+            writer = csv.DictWriter(file, Query.general_headers + ["Key"] + Query.value_headers)
+            writer.writeheader()
+            writer.writerows(rows)
+        finally:
+            if filepath:
+                file.close()
+        return len(rows)
+
+    # Writes timelines, percentiles and outliers of logs that changed since the last export as parquet or arrow files
+    def export_dataset(self, folderpath = None, format = None):
+        dataset = Dataset(self.store, folderpath or self.dataset_folder, format or self.dataset_format)
+
+        start = time.time()
+        written, unchanged, removed = dataset.export()
+        print(f"{written} logs written, {unchanged} unchanged and {removed} removed in {time.time() - start:.2f} s")
+        print("Dataset saved to", dataset.folderpath)
+
+    # Shows plot, or saves it if output is a filepath
+    @staticmethod
+    def show_plot(fig, output = None):
+        import matplotlib.pyplot as plt
+        plt.tight_layout()
+        if output:
+            fig.savefig(output)
+            plt.close(fig)
+        else:
+            plt.show()
+
+    # Draws a box for every log, percentiles is (logs, 5) with nan for logs without the key
+    # All boxes are drawn as one collection, medians and whiskers as one collection each
+    # and all outliers with one scatter, so the number of artists does not grow with the logs
+    @staticmethod
+    def draw_boxes(ax, percentiles, outliers, outlier_counts, colors, label_outliers = True):
+        from matplotlib.patches import Rectangle
+        from matplotlib.collections import PatchCollection
+        from matplotlib.collections import LineCollection
+
+        x = np.flatnonzero(~np.isnan(percentiles).any(axis=1))
+        mins, q1s, medians, q3s, maxs = percentiles[x].T
+
+        # Line from (x0, y0) to (x1, y1) for every log
+        def segments(x0, y0, x1, y1):
+            return np.stack([np.column_stack([x0, y0]), np.column_stack([x1, y1])], axis=1)
+
+        boxes = [Rectangle((j - 0.3, q1), 0.3 * 2, q3 - q1) for j, q1, q3 in zip(x, q1s, q3s)]
+        whiskers = np.concatenate([segments(x, mins, x, q1s),               # Lower whisker
+                                   segments(x - 0.3, mins, x + 0.3, mins),
+                                   segments(x, q3s, x, maxs),               # Upper whisker
+                                   segments(x - 0.3, maxs, x + 0.3, maxs)])
+        ax.add_collection(PatchCollection(boxes, color=colors["box"]), autolim=True)
+        ax.add_collection(LineCollection(segments(x - 0.45, medians, x + 0.45, medians), colors=colors["median"], linewidths=2), autolim=True)
+        ax.add_collection(LineCollection(whiskers, colors="black", linestyles="-"), autolim=True)
+        ax.autoscale_view()
+
+        # Plot outliers as individual points
+        outlier_x = np.concatenate([np.full(len(outliers[j]), j) for j in x] or [np.zeros(0)])
+        outlier_y = np.concatenate([outliers[j] for j in x] or [np.zeros(0)])
+        ax.scatter(outlier_x, outlier_y, color=colors["outliers"], label="Outliers" if label_outliers else "")
+
+        # Only some outliers are kept when there are many, show how many are not plotted
+        for j, max_val in zip(x, maxs):
+            if outlier_counts[j] > len(outliers[j]):
+                top = max(max_val, np.max(outliers[j])) if len(outliers[j]) else max_val
+                ax.annotate(f"+{outlier_counts[j] - len(outliers[j])} more", (j, top), xytext=(0, 5),
+                            textcoords="offset points", ha="center", fontsize=8)
 
     # Combine data from all cameras and display box diagram
-    def display_combined(self, comp, keys):
+    # Plots do not use the instance so reports can draw them in worker processes
+    @staticmethod
+    def display_combined(comp, keys, output = None):
+        import matplotlib.pyplot as plt
+        from tqdm import tqdm
 
         if __debug__: # Change colors and language for report
             units = {
@@ -321,8 +747,9 @@ class Data:
             }
         
         # Prepare data for plotting
-        data = {key: [] for key in keys}
         outliers = {key: [] for key in keys}
+        outlier_counts = {key: [] for key in keys}
+        errors = {key: [] for key in keys}
 
         labels = []  # Store log version labels
         for log in comp:
@@ -332,17 +759,21 @@ class Data:
             else:
                 labels.append(log.return_identifier())
         
+        # Percentiles of all logs for every key, nan if log does not have key
+        percentiles = {key: np.full((len(comp), 5), np.nan) for key in keys}
         for key in tqdm(keys, "Reformatting data for plots"):
-            for log in comp:
+            for j, log in enumerate(comp):
                 try:
                     # Get aggregated data and outliers for the key
-                    data[key].append(log.return_all_agg_data(key))
-                    outliers[key].append(log.return_all_outliers(key))
+                    log_data = (log.return_all_agg_data(key), log.return_all_outliers(key),
+                                log.return_all_outlier_count(key), log.return_all_error(key))
                 except KeyError:
                     # Handle missing data for the key
-                    data[key].append([None, None, None, None, None])
-                    outliers[key].append([])
-            
+                    log_data = (np.nan, [], 0, 0.0)
+                percentiles[key][j] = log_data[0]
+                outliers[key].append(np.asarray(log_data[1], dtype=np.float64))
+                outlier_counts[key].append(log_data[2])
+                errors[key].append(log_data[3])
 
         plot_count = len(keys)
 
@@ -358,39 +789,12 @@ class Data:
 
         for i, (ax, key) in tqdm(enumerate(zip(axes, keys)), "Creating plots"):
 
-            # Extract aggregated statistics
-            aggregated_data = np.array(data[key])
-            mins = aggregated_data[:, 0]
-            q1s = aggregated_data[:, 1]
-            medians = aggregated_data[:, 2]
-            q3s = aggregated_data[:, 3]
-            maxs = aggregated_data[:, 4]
-
-            plot_data = zip(labels, mins, q1s, medians, q3s, maxs, outliers[key])
-
-            # Plot box for each key
-            for j, (label, min_val, q1, median, q3, max_val, log_outliers) in enumerate(plot_data):
-
-                if any(x is None for x in [min_val, q1, median, q3, max_val]):
-                    continue
+            Data.draw_boxes(ax, percentiles[key], outliers[key], outlier_counts[key], colors, i == 0)
 
-                # Draw the box
-                box = Rectangle((j - 0.3, q1), 0.3 * 2, q3 - q1, color=colors["box"])
-                ax.add_patch(box)
-                # Draw the median
-                ax.plot([j - 0.45, j + 0.45], [median, median], color=colors["median"], linewidth=2)
-                # Draw the lower whisker
-                ax.plot([j, j], [min_val, q1], color="black", linestyle="-")
-                ax.plot([j - 0.3, j + 0.3], [min_val, min_val], color="black", linestyle="-")
-                # Draw the upper whisker
-                ax.plot([j, j], [q3, max_val], color="black", linestyle="-")
-                ax.plot([j - 0.3, j + 0.3], [max_val, max_val], color="black", linestyle="-")
-
-                # Plot outliers as individual points
-                ax.scatter([j] * len(log_outliers), log_outliers, color=colors["outliers"], label="Outliers" if i == 0 and j == 0 else "")
-
-                if __debug__:
-                    print(label, min_val, q1, median, q3, max_val)
+            if __debug__:
+                for label, values in zip(labels, percentiles[key]):
+                    if not np.isnan(values).any():
+                        print(label, *values)
             
             # Tidying plots
             if not __debug__: # Remove titles for report
@@ -400,13 +804,15 @@ class Data:
                 else:
                     ax.set_title(key)
 
+            # Percentiles from sketches are approximate, show the error bound in the label
+            key_labels = [label if error == 0 else f"{label}\n(±{error * 100:g}%)" for label, error in zip(labels, errors[key])]
+
             ax.set_xticks(range(len(labels)))  # Set tick positions correctly
-            ax.set_xticklabels(labels, rotation=30, ha="right")  # Set log version labels
+            ax.set_xticklabels(key_labels, rotation=30, ha="right")  # Set log version labels
             ax.grid(True)
 
-            try:
-                label = key.split("(")[-1][:-1]
-            except IndexError:
+            label = CATALOGUE.return_unit(key)
+            if not label:
                 continue
 
             if label[-1] == "s":
@@ -416,28 +822,41 @@ class Data:
             ax.set_ylabel(label)
 
         # Show the plot
-        plt.tight_layout()
-        plt.show()
-
-    def display_timeline(self, comp, keys):
+        Data.show_plot(fig, output)
+
+    # One bucket for every pixel of the plot width
+    @staticmethod
+    def plot_buckets(ax):
+        return max(int(ax.bbox.width), 1)
+
+    # Downsamples the visible part of timelines again so more detail is shown when zoomed in
+    @staticmethod
+    def refine_timeline(ax, lines):
+        start, end = ax.get_xlim()
+        for line, pyramid in lines:
+            line.set_data(*pyramid.downsample(start, end, Data.plot_buckets(ax)))
+        ax.figure.canvas.draw_idle()
+
+    # filename is asked for until none is chosen if it is not given
+    @staticmethod
+    def display_timeline(comp, keys, filename = None, output = None):
+        import matplotlib.pyplot as plt
+        from tqdm import tqdm
         filenames = []
         for log in comp:
-            data = log.return_filenames()
-            for filename in data:
-                if not filename in filenames:
-                    filenames.append(filename)
+            for log_filename in log.return_filenames():
+                if not log_filename in filenames:
+                    filenames.append(log_filename)
         filenames.sort()
         
+        interactive = filename is None
         while True:
-            print("Choose file to plot")
-            filename = input_str(filenames)
-            if not filename:
-                break
+            if interactive:
+                print("Choose file to plot")
+                filename = input_str(filenames)
+                if not filename:
+                    break
 
-            data = []
-            for i in comp:
-                data.append(i.return_timeline(keys, filename))
-            
             plot_count = len(comp)
 
             columns = plot_count
@@ -450,14 +869,70 @@ class Data:
             if plot_count == 1:  
                 axes = [axes]  # Ensure iterable axes for single key
 
-            for i, (ax, log, dict) in tqdm(enumerate(zip(axes, comp, data)), "Creating plots"):
-                for j, key in enumerate(dict):
-                    ax.plot(range(len(dict[key])), dict[key], label=key)
-                
+            # Timelines are downsampled to the width of the plot, and again for the visible part when zooming
+            for ax, log in tqdm(zip(axes, comp), "Creating plots", total=plot_count):
+                lines = []
+                for key in keys:
+                    pyramid = log.return_pyramid(filename, key)
+                    if pyramid is None:
+                        continue
+                    line, = ax.plot(*pyramid.downsample(0, len(pyramid), Data.plot_buckets(ax)), label=key)
+                    lines.append((line, pyramid))
+                ax.callbacks.connect("xlim_changed", lambda ax, lines=lines: Data.refine_timeline(ax, lines))
+
                 ax.set_title(log.return_identifier())
                 ax.set_xlabel("Log entry timeline (not same as elapsed time)")
                 ax.legend()
 
             # Show the plot
-            plt.tight_layout()
-            plt.show()
\ No newline at end of file
+            Data.show_plot(fig, output)
+            if not interactive:
+                break
+
+    # Stacked mean time of stages for frames sorted by loop duration, shows which stages make slow frames slow.
+    # keys are the stages, all keys in ms except loop duration are used if none of them are in the file.
+    # filename is asked for until none is chosen if it is not given
+    @staticmethod
+    def display_stages(comp, keys, filename = None, output = None):
+        import matplotlib.pyplot as plt
+        from tqdm import tqdm
+        filenames = sorted({log_filename for log in comp for log_filename in log.return_filenames()})
+
+        interactive = filename is None
+        while True:
+            if interactive:
+                print("Choose file to plot")
+                filename = input_str(filenames)
+                if not filename:
+                    break
+
+            plot_count = len(comp)
+            fig, axes = plt.subplots(1, plot_count, figsize=(6 * plot_count, 5))
+            if plot_count == 1:
+                axes = [axes]  # Ensure iterable axes for single log
+
+            for ax, log in tqdm(zip(axes, comp), "Creating plots", total=plot_count):
+                ax.set_title(log.return_identifier())
+                records = log.return_iterations(filename)
+                if records is None:
+                    continue
+
+                stages = [key for key in keys if key in records.dtype.names and key != "Loop, Duration (ms)"]
+                if stages == []:
+                    stages = [key for key in records.dtype.names if key.endswith("(ms)") and not key.startswith("Loop")]
+                breakdown = Log.stage_breakdown(records, stages)
+                if breakdown is None:
+                    continue
+
+                x, means, durations = breakdown
+                ax.stackplot(x, means.T, labels=stages)
+                ax.plot(x, durations, color="black", linestyle="--", label="Loop, Duration (ms)")
+                ax.set_xlabel("Frames sorted by loop duration (%)")
+                ax.set_ylabel("Mean time (ms)")
+                ax.grid(True)
+                ax.legend(fontsize=8)
+
+            # Show the plot
+            Data.show_plot(fig, output)
+            if not interactive:
+                break
\ No newline at end of file
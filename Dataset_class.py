@@ -0,0 +1,190 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import json
+import shutil
+import numpy as np
+
+#%% Dataset
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+TABLES = ["series", "percentiles", "outliers"]
+
+# Logs in the store as tables for pandas, polars or pyarrow, every table has a folder for every log
+# so it is read as a dataset partitioned by run, for example pandas.read_parquet("dataset/series"):
+#   series/run=<name>/part-0        file, key, index, value for every value in the timelines
+#   percentiles/run=<name>/part-0   file, key, min, q1, median, q3, max, error, outlier_count
+#   outliers/run=<name>/part-0      file, key, value for the outliers kept for box plots
+#   runs                            run and general data of every log
+#   export.json                     format and when every exported log was written
+# file is empty in percentiles and outliers for all files of the log together.
+# Only logs that are new or imported again since the last export are written.
+# pyarrow is optional and only needed for this export
+class Dataset:
+    def __init__(self, store, folderpath, format = "parquet"):
+        if not format in FORMATS:
+            raise ValueError(f"Format must be one of {', '.join(FORMATS)}, not {format}")
+        self.store = store
+        self.folderpath = folderpath
+        self.format = format
+        self.manifest_filepath = os.path.join(folderpath, "export.json")
+
+    def partition_folderpath(self, table, name):
+        return os.path.join(self.folderpath, table, "run=" + name)
+
+#%% Export
+    # Writes logs that changed, removes logs not in store, returns number of written, unchanged and removed logs
+    def export(self):
+        os.makedirs(self.folderpath, exist_ok=True)
+        manifest = self.open_manifest()
+        previous = manifest.get("stamps", {})
+        stamps = dict(previous) if manifest.get("format") == self.format else {}
+
+        written = 0
+        for name in self.store.names:
+            stamp = self.store.return_stamp(name)
+            if stamps.get(name) == stamp:
+                continue
+            self.write_log(name, self.store.load(name))
+            stamps[name] = stamp
+            written += 1
+
+        removed = [name for name in previous if not name in self.store.names]
+        for name in removed:
+            for table in TABLES:
+                shutil.rmtree(self.partition_folderpath(table, name), ignore_errors=True)
+            stamps.pop(name, None)
+
+        self.write_runs()
+        self.save_manifest({"format": self.format, "stamps": stamps})
+        return written, len(self.store.names) - written, len(removed)
+
+    def open_manifest(self):
+        try:
+            with open(self.manifest_filepath, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    def save_manifest(self, manifest):
+        with open(self.manifest_filepath, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=1)
+
+    # Table is written to a temporary folder first so a log is never left half written
+    def write_table(self, table, name, columns):
+        import pyarrow as pa
+
+        folderpath = self.partition_folderpath(table, name)
+        temp_folderpath = folderpath + ".tmp"
+        shutil.rmtree(temp_folderpath, ignore_errors=True)
+        os.makedirs(temp_folderpath)
+        self.write_file(pa.table(columns), os.path.join(temp_folderpath, "part-0" + FORMATS[self.format]))
+        shutil.rmtree(folderpath, ignore_errors=True)
+        os.replace(temp_folderpath, folderpath)
+
+    def write_file(self, table, filepath):
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, filepath)
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, filepath)
+
+    # file and key are dictionary encoded, one code for every array in arrays
+    @staticmethod
+    def labels(codes, names, lengths):
+        import pyarrow as pa
+        return pa.DictionaryArray.from_arrays(np.repeat(np.asarray(codes, dtype=np.int32), lengths), pa.array(names, pa.string()))
+
+    def write_log(self, name, log):
+        filenames = log.return_filenames()
+        keys = log.return_keys()
+        key_index = {key: j for j, key in enumerate(keys)}
+
+        # Logs imported before timelines were saved parse the files
+        series = getattr(log, "series", None)
+        if series is None:
+            series = {filename: log.return_timeline(list(log.agg_data[filename]), filename) for filename in filenames}
+
+        file_codes, key_codes, arrays = [], [], []
+        for i, filename in enumerate(filenames):
+            for key, array in series.get(filename, {}).items():
+                if key in key_index:
+                    file_codes.append(i)
+                    key_codes.append(key_index[key])
+                    arrays.append(np.asarray(array, dtype=np.float64))
+        lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+        starts = np.cumsum(lengths) - lengths
+        self.write_table("series", name, {
+            "file"  : self.labels(file_codes, filenames, lengths),
+            "key"   : self.labels(key_codes, keys, lengths),
+            "index" : np.arange(lengths.sum()) - np.repeat(starts, lengths),
+            "value" : np.concatenate(arrays) if arrays else np.zeros(0)})
+
+        # A row for every file and a last row for all files, None is written as an empty file
+        rows = [(filename, log.agg_data[filename], log.outliers[filename],
+                 getattr(log, "outlier_counts", {}).get(filename, {}), getattr(log, "errors", {}).get(filename, {}))
+                for filename in filenames]
+        rows.append((None, log.all_agg_data, log.all_outliers,
+                     getattr(log, "all_outlier_counts", {}), getattr(log, "all_errors", {})))
+
+        row_files, row_keys, percentiles, errors, counts = [], [], [], [], []
+        outlier_files, outlier_keys, outliers = [], [], []
+        for filename, agg_data, outlier_data, count_data, error_data in rows:
+            for key in agg_data:
+                array = np.asarray(outlier_data.get(key, []), dtype=np.float64)
+                row_files.append(filename)
+                row_keys.append(key)
+                percentiles.append(np.asarray(agg_data[key], dtype=np.float64))
+                errors.append(error_data.get(key, 0.0))
+                counts.append(count_data.get(key, len(array)))
+                outlier_files.append(filename)
+                outlier_keys.append(key)
+                outliers.append(array)
+
+        percentiles = np.array(percentiles, dtype=np.float64).reshape(-1, 5)
+        columns = {"file": row_files, "key": row_keys}
+        for j, column in enumerate(["min", "q1", "median", "q3", "max"]):
+            columns[column] = percentiles[:, j]
+        columns["error"] = np.array(errors, dtype=np.float64)
+        columns["outlier_count"] = np.array(counts, dtype=np.int64)
+        self.write_table("percentiles", name, columns)
+
+        lengths = np.array([len(array) for array in outliers], dtype=np.int64)
+        self.write_table("outliers", name, {
+            "file"  : np.repeat(np.array(outlier_files, dtype=object), lengths),
+            "key"   : np.repeat(np.array(outlier_keys, dtype=object), lengths),
+            "value" : np.concatenate(outliers) if outliers else np.zeros(0)})
+
+    # General data of all logs, attributes with values of different types are written as text
+    def write_runs(self):
+        import pyarrow as pa
+
+        general = [self.store.general[name] for name in self.store.names]
+        attributes = list(dict.fromkeys(attribute for general_data in general for attribute in general_data))
+        columns = {"run": pa.array(self.store.names, pa.string())}
+        for attribute in attributes:
+            values = [general_data.get(attribute) for general_data in general]
+            try:
+                columns[attribute] = pa.array(values)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                columns[attribute] = pa.array([None if value is None else str(value) for value in values], pa.string())
+
+        for extension in FORMATS.values():
+            if os.path.exists(os.path.join(self.folderpath, "runs" + extension)):
+                os.remove(os.path.join(self.folderpath, "runs" + extension))
+        self.write_file(pa.table(columns), os.path.join(self.folderpath, "runs" + FORMATS[self.format]))
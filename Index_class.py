@@ -0,0 +1,176 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import mmap
+import numpy as np
+
+#%% Custom modules
+from functions import INDEX_EXTENSION
+
+# Bytes scanned at a time when the index is made or a file is imported, memory used while scanning grows with this
+BLOCK_BYTES = 1 << 20
+
+# Masks keeping the first n bytes of a little endian 8 byte word, n from 0 to 8
+WORD_MASKS = np.array([(1 << (8 * n)) - 1 for n in range(9)], dtype=np.uint64)
+
+#%% Line index
+# Index of an uncompressed log file, made on first use and saved beside the file
+# For every key (text before the first ':') it has the line numbers of lines with that key,
+# lines can then be read from the memory mapped file without reading the rest of the file
+#   line_starts  int64 byte offset of every line and the end of the file last
+#   keys         str keys in order of key id
+#   key_starts   int64 start and end of the lines for key id in key_lines
+#   key_lines    int64 line numbers grouped by key id, in order in file within a key
+class LineIndex:
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.index_filepath = filepath + INDEX_EXTENSION
+
+        stat = os.stat(filepath)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+
+        if not self.load():
+            self.build()
+            self.save()
+
+    # Index is made again if the file changed since it was saved
+    def load(self):
+        if not os.path.exists(self.index_filepath):
+            return False
+        with np.load(self.index_filepath) as index:
+            if int(index["size"]) != self.size or int(index["mtime"]) != self.mtime:
+                return False
+            self.line_starts = index["line_starts"]
+            self.keys = [str(key) for key in index["keys"]]
+            self.key_starts = index["key_starts"]
+            self.key_lines = index["key_lines"]
+        return True
+
+    # Folders that cannot be written to still get an index, it is just not saved
+    def save(self):
+        try:
+            with open(self.index_filepath, "wb") as file:
+                np.savez(file, size=self.size, mtime=self.mtime, line_starts=self.line_starts,
+                         keys=np.array(self.keys, dtype=str), key_starts=self.key_starts, key_lines=self.key_lines)
+        except OSError:
+            pass
+
+#%% Build
+    def build(self):
+        line_starts = []
+        line_keys = []
+        key_ids = {}
+        if self.size:
+            with open(self.filepath, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = np.frombuffer(mm, dtype=np.uint8)
+                for start, end in self.block_ranges(mm, 0, self.size):
+                    starts, keys, _ = self.scan_block(data[start:end], start, key_ids)
+                    line_starts.append(starts)
+                    line_keys.append(keys)
+                del data
+
+        self.line_starts = np.concatenate([*line_starts, [self.size]]).astype(np.int64)
+        line_keys = np.concatenate(line_keys) if line_keys else np.zeros(0, dtype=np.int64)
+        self.keys = list(key_ids)
+
+        # Lines without key are not in the index
+        order = np.argsort(line_keys, kind="stable")
+        order = order[line_keys[order] >= 0]
+        self.key_lines = order.astype(np.int64)
+        counts = np.bincount(line_keys[order], minlength=len(self.keys))
+        self.key_starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    # Start and end of blocks of about BLOCK_BYTES between start and end of memory mapped file mm
+    # Blocks end after a newline so no line is split between blocks
+    @staticmethod
+    def block_ranges(mm, start, end):
+        while start < end:
+            block_end = min(start + BLOCK_BYTES, end)
+            if block_end < end:
+                newline = mm.rfind(b"\n", start, block_end)
+                if newline < 0:
+                    newline = mm.find(b"\n", block_end, end)
+                block_end = newline + 1 if newline >= 0 else end
+            yield start, block_end
+            start = block_end
+
+    # Line starts, key id and start of value after the first ':' of every line in block, -1 if line has no key
+    # Keys are found for all lines at once by hashing the bytes before ':' as 8 byte words
+    @staticmethod
+    def scan_block(block, offset, key_ids):
+        starts = np.concatenate([[0], np.flatnonzero(block == ord("\n")) + 1])
+        if starts[-1] == len(block):
+            starts = starts[:-1]
+        ends = np.append(starts[1:], len(block))
+
+        colons = np.flatnonzero(block == ord(":"))
+        first_colon = colons[np.minimum(np.searchsorted(colons, starts), len(colons) - 1)] if len(colons) else ends
+        has_key = (first_colon >= starts) & (first_colon < ends)
+
+        line_keys = np.full(len(starts), -1, dtype=np.int64)
+        if has_key.any():
+            key_starts = starts[has_key]
+            lengths = first_colon[has_key] - key_starts
+
+            # Keys read as 8 byte words from any byte offset, bytes after the key masked away,
+            # and hashed so lines are grouped by sorting one integer per line
+            width = max(int(lengths.max()), 1) + 7 & ~7
+            padded = np.concatenate([block, np.zeros(width, dtype=np.uint8)])
+            words = np.ndarray(len(block) + width - 7, dtype="<u8", buffer=padded, strides=(1,))
+            key_words = [words[key_starts + i] & WORD_MASKS[np.clip(lengths - i, 0, 8)] for i in range(0, width, 8)]
+            hashes = lengths.astype(np.uint64)
+            for word in key_words:
+                hashes = hashes * np.uint64(0x100000001B3) + word
+            _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+
+            # Hashes are checked against the first line with the same hash, if two keys ever
+            # have the same hash the lines are grouped by comparing all words instead
+            if not all(np.array_equal(word, word[first][inverse]) for word in key_words):
+                rows = np.ascontiguousarray(np.stack(key_words + [lengths.astype(np.uint64)], axis=1))
+                _, first, inverse = np.unique(rows.view(np.dtype((np.void, rows.shape[1] * 8))).ravel(),
+                                              return_index=True, return_inverse=True)
+
+            # Keys are stripped like in Log.parse_lines so keys with other spacing get the same id
+            ids = np.array([key_ids.setdefault(block[start:start + length].tobytes().decode("utf-8", errors="replace").strip(), len(key_ids))
+                            for start, length in zip(key_starts[first], lengths[first])], dtype=np.int64)
+            line_keys[has_key] = ids[inverse.ravel()]
+
+        return starts + offset, line_keys, first_colon + 1 + offset
+
+#%% return data
+    def return_keys(self):
+        return self.keys
+
+    # Line numbers and byte offsets of lines with key
+    def return_lines(self, key):
+        if not key in self.keys:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        i = self.keys.index(key)
+        lines = self.key_lines[self.key_starts[i]:self.key_starts[i + 1]]
+        return lines, self.line_starts[lines]
+
+    # Text of all lines with any of keys, in order in file
+    def read_lines(self, keys):
+        lines = np.sort(np.concatenate([self.return_lines(key)[0] for key in keys] or [np.zeros(0, dtype=np.int64)]))
+        if len(lines) == 0:
+            return []
+        with open(self.filepath, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = b"".join([mm[start:end] for start, end in zip(self.line_starts[lines], self.line_starts[lines + 1])])
+        return text.decode("utf-8").split("\n")
@@ -0,0 +1,204 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import queue
+import shlex
+import threading
+import posixpath
+import numpy as np
+import matplotlib.pyplot as plt
+
+#%% Classes
+from Log_class import Log
+
+#%% Fixed size buffer
+# Keeps the last 'capacity' values, older values are overwritten so memory does not grow
+class RingBuffer:
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity)
+        self.start = 0      # Index of oldest value
+        self.size = 0       # Number of values in buffer
+        self.count = 0      # Number of values added in total
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        values = values[-len(self.data):]
+
+        end = (self.start + self.size) % len(self.data)
+        first = min(len(values), len(self.data) - end)
+        self.data[end:end + first] = values[:first]
+        self.data[:len(values) - first] = values[first:]
+
+        overflow = max(0, self.size + len(values) - len(self.data))
+        self.start = (self.start + overflow) % len(self.data)
+        self.size = min(len(self.data), self.size + len(values))
+
+    # Values from oldest to newest
+    def values(self):
+        return np.roll(self.data, -self.start)[:self.size]
+
+#%% Live view
+# Follows camera logs while GulliView is running, either in a local folder or over SSH with tail,
+# and shows the latest values of some keys with rolling percentiles
+class Live:
+    def __init__(self, keys, general_filename, window = 2000, interval = 1.0):
+        self.keys = keys
+        self.general_filename = general_filename
+        self.window = window        # Number of values kept for every camera file and key
+        self.interval = interval    # Seconds between updates of the plot
+
+        self.buffers = {}           # (filename, key): RingBuffer
+
+        # Local files
+        self.folderpath = None
+        self.offsets = {}           # filename: bytes read
+        self.remainders = {}        # filename: last line if it is not complete
+
+        # Remote files
+        self.lines = queue.Queue()
+        self.channel = None
+
+    # Only lines added after start are read, like tail -n 0
+    def follow_local(self, folderpath):
+        self.folderpath = folderpath
+        for filename in self.camera_files(os.listdir(folderpath)):
+            self.offsets[filename] = os.path.getsize(os.path.join(folderpath, filename))
+
+    # Runs tail on the remote computer and reads the output in a thread,
+    # -v writes the file headers even when only one file is followed
+    def follow_remote(self, ssh, remote_folder, filenames):
+        paths = [shlex.quote(posixpath.join(remote_folder, filename)) for filename in self.camera_files(filenames)]
+        stdin, stdout, stderr = ssh.exec_command("tail -v -n 0 -F " + " ".join(paths))
+        self.channel = stdout.channel
+        threading.Thread(target=self.read_remote, args=(stdout,), daemon=True).start()
+
+    def camera_files(self, filenames):
+        return [filename for filename in filenames if filename != self.general_filename and not "exclude" in filename]
+
+    # tail writes "==> path <==" before lines from a new file
+    def read_remote(self, stdout):
+        filename = None
+        for line in stdout:
+            if line.startswith("==> ") and line.rstrip().endswith(" <=="):
+                filename = posixpath.basename(line.strip()[4:-4])
+            elif filename:
+                self.lines.put((filename, line))
+
+    def stop(self):
+        if self.channel:
+            self.channel.close()
+
+#%% Update data
+    # Reads new lines from all sources and adds the values to the buffers
+    def poll(self):
+        new_lines = {}
+        if self.folderpath:
+            for filename in self.camera_files(os.listdir(self.folderpath)):
+                new_lines[filename] = self.read_local(filename)
+
+        while True:
+            try:
+                filename, line = self.lines.get_nowait()
+            except queue.Empty:
+                break
+            new_lines.setdefault(filename, []).append(line)
+
+        for filename, lines in new_lines.items():
+            self.add_lines(filename, lines)
+
+    # New complete lines in local file since last read
+    def read_local(self, filename):
+        filepath = os.path.join(self.folderpath, filename)
+        size = os.path.getsize(filepath)
+        offset = self.offsets.get(filename, 0)
+
+        # File was truncated or replaced, start over
+        if size < offset:
+            offset = 0
+            self.remainders[filename] = b""
+        if size == offset:
+            return []
+
+        with open(filepath, 'rb') as file:
+            file.seek(offset)
+            data = self.remainders.get(filename, b"") + file.read(size - offset)
+        self.offsets[filename] = size
+
+        complete, _, self.remainders[filename] = data.rpartition(b"\n")
+        if not complete:
+            return []
+        return complete.decode("utf-8", errors="replace").split("\n")
+
+    def add_lines(self, filename, lines):
+        data, _ = Log.parse_lines(lines)
+        if not data:
+            return
+        values = Log.format_data(data)
+        for key in self.keys:
+            if key in values:
+                self.buffers.setdefault((filename, key), RingBuffer(self.window)).extend(values[key])
+
+    # Percentiles of the latest values from all cameras for key, None if there are no values
+    def rolling_percentiles(self, key):
+        buffers = [buffer for (filename, buffer_key), buffer in self.buffers.items() if buffer_key == key and buffer.size]
+        if not buffers:
+            return None, 0
+        values = np.concatenate([buffer.values() for buffer in buffers])
+        aggregated_values, _ = Log.aggregate({key: values})
+        return aggregated_values[key], sum(buffer.count for buffer in buffers)
+
+#%% Plot
+    # Updates plot every interval until the window is closed
+    def run(self):
+        fig, (ax_timeline, ax_box) = plt.subplots(1, 2, figsize=(12, 5), gridspec_kw={"width_ratios": [3, 1]})
+        plt.ion()
+        plt.show()
+        while plt.fignum_exists(fig.number):
+            self.poll()
+            self.draw(ax_timeline, ax_box)
+            plt.pause(self.interval)
+        plt.ioff()
+
+    def draw(self, ax_timeline, ax_box):
+        ax_timeline.clear()
+        for (filename, key), buffer in sorted(self.buffers.items()):
+            values = buffer.values()
+            ax_timeline.plot(range(buffer.count - len(values), buffer.count), values, label=f"{filename}: {key}")
+        ax_timeline.set_title(f"Latest {self.window} values")
+        ax_timeline.set_xlabel("Log entry")
+        ax_timeline.grid(True)
+        if self.buffers:
+            ax_timeline.legend(fontsize=8, loc="upper left")
+
+        # Whiskers as in box plots of imported logs, outliers are not shown
+        stats = []
+        for key in self.keys:
+            percentiles, count = self.rolling_percentiles(key)
+            if percentiles is None:
+                continue
+            stats.append({"whislo": percentiles[0], "q1": percentiles[1], "med": percentiles[2],
+                          "q3": percentiles[3], "whishi": percentiles[4], "fliers": [],
+                          "label": f"{key}\n{count} values"})
+        ax_box.clear()
+        if stats:
+            ax_box.bxp(stats, showfliers=False)
+            ax_box.tick_params(axis="x", labelsize=8)
+        ax_box.set_title("Rolling percentiles")
+        ax_box.grid(True)
@@ -16,63 +16,280 @@
 # along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
 
 #%% Standard modules
-from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
 import os
+import mmap
+import time
+import json
 import datetime as dt
 import numpy as np
-import bisect
+from itertools import islice
+from itertools import repeat
 
 #%% Custom modules
+from Sketch_class import QuantileSketch
 from functions import try_int_float_convert
+from functions import encode_general
+from functions import decode_general
+from functions import LRUCache
+from functions import log_name
+from functions import find_log
+from functions import open_log
+from functions import line_end
+from functions import COMPRESSION_EXTENSIONS
+from functions import log_filenames
+
+#%% Classes
+from Index_class import LineIndex
+from Index_class import BLOCK_BYTES
+from Catalogue_class import CATALOGUE
+from Pyramid_class import Pyramid
+
+# Increase when parsing, aggregation or saved data changes so reimport rebuilds all logs
+PARSER_VERSION = 7
+
+# How percentiles are calculated
+#   mode:             "exact" sorts all values, "sketch" uses quantile sketches,
+#                     "auto" uses exact for keys with at most exact_limit values
+#   exact_limit:      max number of values for exact mode in auto
+#   accuracy:         relative error of percentiles from sketches
+#   outlier_extremes: number of lowest and highest outliers that are kept, negative keeps all outliers
+#   outlier_samples:  number of outliers kept evenly spread over the rest
+AGGREGATION = {"mode": "auto", "exact_limit": 1000000, "accuracy": 0.01,
+               "outlier_extremes": 50, "outlier_samples": 200}
+
+# Timelines with more values than this are aggregated with sketches when a growing log is updated, even if the
+# import was exact, so an update takes about as long for a long file as for a short one.
+# In "exact" mode every update finds the percentiles of all values of the file and of all files again
+UPDATE_EXACT_LIMIT = 100000
+
+# Types timelines are saved as, every key is saved as the first type that keeps its values, see series_dtype
+SERIES_DTYPES = ["int32", "int64", "float32", "float64"]
+
+# Number of lines parsed at a time from line iterables, sketches are updated after every chunk
+CHUNK_LINES = 100000
+
+# Bytes removed around values like str.strip
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(b" \t\n\r\x0b\x0c")] = True
+
+# Import, format and aggregate one camera file
+# end is the number of bytes to parse in an uncompressed file, None parses the whole file
+# Defined on module level so it can be sent to worker processes
+def process_file(filepath, aggregation = AGGREGATION, end = None):
+    return process_chunks(Log.import_blocks(filepath, 0, end), aggregation)
+
+# Format and aggregate lines from a camera file, lines can come from any iterable such as a download
+def process_lines(lines, aggregation = AGGREGATION):
+    return process_chunks(Log.parse_chunks(lines), aggregation)
+
+# Format and aggregate chunks of lines grouped by key
+def process_chunks(chunks, aggregation = AGGREGATION):
+    arrays = {}
+    sketches = {}
+    for data in chunks:
+        for key, array in Log.format_data(data).items():
+            arrays.setdefault(key, []).append(array)
+            if aggregation["mode"] != "exact":
+                sketches.setdefault(key, QuantileSketch(aggregation["accuracy"])).add(array)
+
+    values = {key: np.concatenate(arrays[key]) for key in arrays}
+    agg_data, outliers, outlier_counts, errors = Log.aggregate_values(values, sketches, aggregation)
+    return values, agg_data, outliers, outlier_counts, sketches, errors
+
+# Import a whole log folder and time it
+# Defined on module level so it can be sent to worker processes
+def import_log(folderpath, general_filename, aggregation = AGGREGATION):
+    start = time.perf_counter()
+    log = Log(folderpath, general_filename, False, aggregation=aggregation)
+    return log, time.perf_counter() - start
 
 class Log:
-    def __init__(self, folderpath, general_filename, show_progress = True):
+    # Timelines used for plotting, shared by all logs, size is set from config in Data
+    timeline_cache = LRUCache(256)
 
-        # List of filepaths for files
+    # results can have results from process_lines for files that were processed while downloading
+    # growing is True for folders that are still written to, then only complete lines are parsed
+    def __init__(self, folderpath, general_filename, show_progress = True, workers = 1, aggregation = AGGREGATION, results = None, growing = False):
+
+        # List of filepaths for files, filenames are without compression ending
         self.folderpath = folderpath
         self.general_filename = general_filename
-        self.filenames = os.listdir(folderpath)
+        self.filenames = [log_name(filename) for filename in log_filenames(folderpath)]
 
         # Import general
         self.general_data = {}  # Data denoting version, timestamp, etc
         if self.general_filename in self.filenames:
-            filepath = os.path.join(folderpath, self.general_filename)
-            self.import_file(filepath, True)
+            filepath = find_log(folderpath, self.general_filename)
+            self.general_data, _ = self.import_file(filepath, True)
             self.format_general()
             self.filenames.remove(self.general_filename)
         else:
             self.general_data["TIME"] = dt.datetime.now().strftime("%Y-%m-%d %H;%M;%S")
 
+        # Bytes parsed in uncompressed files, update only parses lines added after this
+        # Files are parsed to the end unless the folder is growing, then the last line can still be written to
+        results = dict(results or {})
+        self.aggregation = aggregation
+        self.offsets = {}
+        for filename in self.filenames:
+            filepath = find_log(folderpath, filename)
+            if filepath != os.path.join(folderpath, filename):
+                continue
+            if growing and not filename in results:
+                self.offsets[filename] = line_end(filepath)
+            else:
+                self.offsets[filename] = os.path.getsize(filepath)
+
+        # Go through all files in folder that are not processed yet and format,
+        # in worker processes if more than one worker
+        pending = [filename for filename in self.filenames if not filename in results]
+        filepaths = [find_log(folderpath, filename) for filename in pending]
+        ends = [self.offsets.get(filename) if growing else None for filename in pending]
+        if workers > 1 and len(filepaths) > 1:
+            executor = ProcessPoolExecutor(min(workers, len(filepaths)))
+            pending_results = executor.map(process_file, filepaths, repeat(aggregation), ends)
+        else:
+            executor = None
+            pending_results = map(process_file, filepaths, repeat(aggregation), ends)
+
         # If we want progress bar or not for importing data
         if show_progress:
-            iterator = tqdm(self.filenames, "Importing data")
-        else:
-            iterator = self.filenames
+            from tqdm import tqdm # Only imported when used since it is slow to import
+            pending_results = tqdm(pending_results, "Importing data", total=len(filepaths))
 
-        # Go through all files in folder and format
         values = {}
+        self.sketches = {} # Sketches for every file and key, not saved so they are made from series after load
         self.agg_data = {} # Aggregated data for plotting
-        self.outliers = {} # Outliers not > 1.5 * IQR
-        for filename in iterator:
-            filepath = os.path.join(folderpath, filename)
-            data, _ = self.import_file(filepath)
-            values[filename] = self.format_data(data)
-            self.agg_data[filename], self.outliers[filename] = self.aggregate(values[filename])
-        
-        # Save all available keys
-        self.keys = []
-        for filename in self.agg_data.keys():
-            self.keys += list(self.agg_data[filename].keys())
-        self.keys = list(dict.fromkeys(self.keys))
+        self.outliers = {} # Outliers not > 1.5 * IQR, only some are kept if there are many
+        self.outlier_counts = {} # Number of outliers before some were removed
+        self.errors = {}   # Relative error of percentiles, 0 if exact
+        try:
+            for filename, result in zip(pending, pending_results):
+                results[filename] = result
+        finally:
+            if executor:
+                executor.shutdown()
+
+        for filename in self.filenames:
+            (values[filename], self.agg_data[filename], self.outliers[filename],
+             self.outlier_counts[filename], self.sketches[filename], self.errors[filename]) = results[filename]
+
+        # Keys are replaced with the strings in the key catalogue so all logs share them
+        for data in [values, self.agg_data, self.outliers, self.outlier_counts, self.sketches, self.errors]:
+            for filename in data:
+                data[filename] = CATALOGUE.intern_dict(data[filename])
+
+        # Full timeline for every file and key, saved with the log so files do not have to be parsed again
+        self.series = values
+        self.aggregate_all()
+
+        # Downsampled timelines for plotting
+        self.pyramids = {filename: {key: Pyramid(array) for key, array in values[filename].items()} for filename in values}
+
+    # Save all available keys and aggregate all files together,
+    # sketches from files are merged if there is too much data for exact, aggregation is self.aggregation if None
+    def aggregate_all(self, aggregation = None):
+        aggregation = aggregation or self.aggregation
+        key_ids = dict.fromkeys(CATALOGUE.intern(key) for filename in self.agg_data for key in self.agg_data[filename])
+        self.key_ids = np.fromiter(key_ids, dtype=np.int32, count=len(key_ids))
+        self.keys = [CATALOGUE.return_key(id) for id in self.key_ids]
 
-        # Combine all data into one dict and aggregate all
         combined_values = {}
+        combined_sketches = {}
         for key in self.keys:
-            combined_values[key] = []
-            for filename in values:
-                if key in values[filename].keys():
-                    combined_values[key] += values[filename][key]
-        self.all_agg_data, self.all_outliers = self.aggregate(combined_values)
+            filenames = [filename for filename in self.series if key in self.series[filename]]
+            arrays = [self.series[filename][key] for filename in filenames]
+            if self.use_exact(sum(map(len, arrays)), aggregation):
+                combined_values[key] = np.concatenate(arrays)
+                continue
+
+            combined_sketches[key] = QuantileSketch(aggregation["accuracy"])
+            for filename in filenames:
+                combined_sketches[key].merge(self.return_sketch(filename, key))
+        self.all_agg_data, self.all_outliers, self.all_outlier_counts, self.all_errors = self.aggregate_values(combined_values, combined_sketches, aggregation)
+
+    # Sketch of timeline for key in file, made from the timeline if it is missing
+    def return_sketch(self, filename, key):
+        sketches = self.sketches.setdefault(filename, {})
+        if not key in sketches:
+            sketches[key] = QuantileSketch(self.aggregation["accuracy"])
+            sketches[key].add(self.series[filename][key])
+        return sketches[key]
+
+    # Parses lines added to uncompressed files since they were parsed last and aggregates again,
+    # new files in folder are imported and files that got smaller are imported again
+    # Compressed files are archived and do not change. Returns filenames that were updated
+    # Only complete lines are parsed since the last line can still be written to
+    # Sketches of files are updated with the new values and long timelines are aggregated with them, see UPDATE_EXACT_LIMIT.
+    # Timelines of updated files are still copied to add the new values
+    def update(self):
+        if getattr(self, "series", None) is None:
+            raise ValueError("Log was imported before timelines were saved and has to be imported again")
+        self.aggregation = getattr(self, "aggregation", AGGREGATION)
+        aggregation = dict(self.aggregation)
+        if aggregation["mode"] == "auto":
+            aggregation["exact_limit"] = min(aggregation["exact_limit"], UPDATE_EXACT_LIMIT)
+        self.offsets = getattr(self, "offsets", {})
+        self.sketches = getattr(self, "sketches", {})
+
+        updated = []
+        for filename in log_filenames(self.folderpath):
+            filepath = os.path.join(self.folderpath, filename)
+            if filename == self.general_filename or log_name(filename) != filename:
+                continue
+
+            # Logs saved before offsets were saved do not know what was parsed
+            offset = self.offsets.get(filename, 0)
+            if os.path.getsize(filepath) < offset or not filename in self.series:
+                offset = 0
+            end = line_end(filepath, offset)
+            if end == offset:
+                continue
+
+            arrays = {}
+            for data in self.import_blocks(filepath, offset, end):
+                for key, array in CATALOGUE.intern_dict(self.format_data(data)).items():
+                    arrays.setdefault(key, []).append(array)
+
+            # Timelines are new arrays, saved timelines are read only memory mapped files
+            if offset == 0:
+                self.series[filename] = {}
+                self.sketches.pop(filename, None)
+            series = self.series[filename]
+            sketches = self.sketches.get(filename, {})
+            for key in arrays:
+                series[key] = np.concatenate([series[key], *arrays[key]] if key in series else arrays[key])
+                if key in sketches:
+                    for array in arrays[key]:
+                        sketches[key].add(array)
+                Log.timeline_cache.remove((self.return_folder_name(), filename, key))
+            Log.timeline_cache.remove(("iterations", self.return_folder_name(), filename))
+
+            # Sketches are only needed for keys with too many values for exact
+            sketches = {}
+            if aggregation["mode"] != "exact":
+                for key in series:
+                    if not self.use_exact(len(series[key]), aggregation):
+                        sketches[key] = self.return_sketch(filename, key)
+            (self.agg_data[filename], self.outliers[filename], self.outlier_counts[filename],
+             self.errors[filename]) = self.aggregate_values(series, sketches, aggregation)
+
+            # Only buckets with new values are made for timelines that got longer
+            self.pyramids = getattr(self, "pyramids", None) or {}
+            pyramids = {} if offset == 0 else self.pyramids.get(filename, {})
+            for key in arrays:
+                pyramids[key] = pyramids[key].extend(series[key]) if key in pyramids else Pyramid(series[key])
+            self.pyramids[filename] = pyramids
+
+            self.offsets[filename] = end
+            if not filename in self.filenames:
+                self.filenames.append(filename)
+            updated.append(filename)
+
+        if updated:
+            self.aggregate_all(aggregation)
+        return updated
 
 #%% return data
     # name of folder with archived logs, it is the timestamp of the log
@@ -107,6 +324,19 @@ class Log:
     def return_keys(self):
         return self.keys
 
+    # ids of keys in the key catalogue, logs from before the catalogue get them when first used
+    def return_key_ids(self):
+        if getattr(self, "key_ids", None) is None:
+            self.key_ids = CATALOGUE.intern_keys(self.keys)
+        return self.key_ids
+
+    # Key ids are only valid in the process that made them so they are not pickled,
+    # logs imported in worker processes get new ids when they are used
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("key_ids", None)
+        return state
+
     # data for plotting from individual files
     def return_agg_data(self, filename, key):
         return self.agg_data[filename][key]
@@ -119,35 +349,429 @@ class Log:
     def return_all_outliers(self, key):
         return self.all_outliers[key]
 
+    # Pyramid to plot timeline of key in file, made from the timeline for logs imported before pyramids were saved
+    # None if file does not have key
+    def return_pyramid(self, filename, key):
+        self.pyramids = getattr(self, "pyramids", None) or {}
+        pyramids = self.pyramids.setdefault(filename, {})
+        if not key in pyramids:
+            timeline = self.return_timeline([key], filename)
+            if not key in timeline:
+                return None
+            pyramids[key] = Pyramid(timeline[key])
+        return pyramids[key]
+
+    # number of outliers including the ones that were not kept
+    def return_all_outlier_count(self, key):
+        return getattr(self, "all_outlier_counts", {}).get(key, len(self.all_outliers[key]))
+
+    # relative error of percentiles, 0 if exact, logs imported before sketches are exact
+    def return_all_error(self, key):
+        return getattr(self, "all_errors", {}).get(key, 0.0)
+
+#%% save and load
+    # Saves aggregated data as numpy arrays in folder, one row for every file and a last row for all files:
+    #   agg.npy             float64 (files + 1, keys, 5) percentiles, nan if key is missing
+    #   present.npy         bool (files + 1, keys) if key is in file
+    #   outliers.npy        float64 all outliers after each other
+    #   outlier_offsets.npy int64 (files + 1, keys, 2) start and end of outliers in outliers.npy
+    #   outlier_counts.npy  int64 (files + 1, keys) number of outliers before some were removed
+    #   errors.npy          float64 (files + 1, keys) relative error of percentiles, 0 if exact
+    #   series_<type>.npy   timelines for all files and keys saved as type after each other, for every type in SERIES_DTYPES
+    #   series_types.npy    int8 (files, keys) index in SERIES_DTYPES of the type timeline is saved as
+    #   series_offsets.npy  int64 (files, keys, 2) start and end of timelines in series_<type>.npy
+    #   pyramid.npy         float64 (buckets, 2) min and max of all pyramid levels after each other
+    #   pyramid_offsets.npy int64 (levels, 5) file index, key index, level, start and end in pyramid.npy
+    #   meta.json           general data, filenames and keys
+    def save(self, folderpath):
+        os.makedirs(folderpath, exist_ok=True)
+
+        key_index = {key: j for j, key in enumerate(self.keys)}
+        rows = [(self.agg_data[filename], self.outliers[filename]) for filename in self.filenames]
+        rows.append((self.all_agg_data, self.all_outliers))
+
+        # Logs imported before sketches are exact
+        errors = np.zeros((len(rows), len(self.keys)))
+        error_rows = [getattr(self, "errors", {}).get(filename, {}) for filename in self.filenames]
+        error_rows.append(getattr(self, "all_errors", {}))
+        for i, error_data in enumerate(error_rows):
+            for key in error_data:
+                errors[i, key_index[key]] = error_data[key]
+
+        # Logs imported before outliers were removed have all outliers
+        count_rows = [getattr(self, "outlier_counts", {}).get(filename, {}) for filename in self.filenames]
+        count_rows.append(getattr(self, "all_outlier_counts", {}))
+        counts = np.zeros((len(rows), len(self.keys)), dtype=np.int64)
+
+        agg = np.full((len(rows), len(self.keys), 5), np.nan)
+        present = np.zeros((len(rows), len(self.keys)), dtype=bool)
+        offsets = np.zeros((len(rows), len(self.keys), 2), dtype=np.int64)
+        outliers = []
+        position = 0
+        for i, (agg_data, outlier_data) in enumerate(rows):
+            for key in agg_data:
+                j = key_index[key]
+                agg[i, j] = agg_data[key]
+                present[i, j] = True
+
+                array = np.asarray(outlier_data.get(key, []), dtype=np.float64)
+                counts[i, j] = count_rows[i].get(key, len(array))
+                offsets[i, j] = position, position + len(array)
+                position += len(array)
+                outliers.append(array)
+
+        np.save(os.path.join(folderpath, "agg.npy"), agg)
+        np.save(os.path.join(folderpath, "present.npy"), present)
+        np.save(os.path.join(folderpath, "outliers.npy"), np.concatenate(outliers) if outliers else np.zeros(0))
+        np.save(os.path.join(folderpath, "outlier_offsets.npy"), offsets)
+        np.save(os.path.join(folderpath, "outlier_counts.npy"), counts)
+        np.save(os.path.join(folderpath, "errors.npy"), errors)
+
+        # Logs imported before timelines were saved do not have series
+        series = getattr(self, "series", None)
+        if series is not None:
+            offsets = np.zeros((len(self.filenames), len(self.keys), 2), dtype=np.int64)
+            types = np.zeros((len(self.filenames), len(self.keys)), dtype=np.int8)
+            arrays = {dtype: [] for dtype in SERIES_DTYPES}
+            positions = dict.fromkeys(SERIES_DTYPES, 0)
+            for i, filename in enumerate(self.filenames):
+                for key, array in series[filename].items():
+                    if not key in key_index:
+                        continue
+                    dtype = self.series_dtype(array)
+                    offsets[i, key_index[key]] = positions[dtype], positions[dtype] + len(array)
+                    types[i, key_index[key]] = SERIES_DTYPES.index(dtype)
+                    positions[dtype] += len(array)
+                    arrays[dtype].append(np.asarray(array, dtype=dtype))
+
+            for dtype in SERIES_DTYPES:
+                np.save(os.path.join(folderpath, f"series_{dtype}.npy"),
+                        np.concatenate(arrays[dtype]) if arrays[dtype] else np.zeros(0, dtype=dtype))
+            np.save(os.path.join(folderpath, "series_types.npy"), types)
+            np.save(os.path.join(folderpath, "series_offsets.npy"), offsets)
+
+        # Logs imported before pyramids were saved make them when plotting
+        pyramids = getattr(self, "pyramids", None)
+        if pyramids:
+            offsets = []
+            arrays = []
+            position = 0
+            for i, filename in enumerate(self.filenames):
+                for key, pyramid in pyramids.get(filename, {}).items():
+                    if not key in key_index:
+                        continue
+                    for level, (mins, maxs) in enumerate(pyramid.levels):
+                        offsets.append([i, key_index[key], level, position, position + len(mins)])
+                        position += len(mins)
+                        arrays.append(np.column_stack([mins, maxs]))
+
+            np.save(os.path.join(folderpath, "pyramid.npy"), np.concatenate(arrays) if arrays else np.zeros((0, 2)))
+            np.save(os.path.join(folderpath, "pyramid_offsets.npy"), np.array(offsets, dtype=np.int64).reshape(-1, 5))
+
+        meta = {"format": 1,
+                "folderpath": self.folderpath,
+                "general_filename": self.general_filename,
+                "filenames": self.filenames,
+                "keys": self.keys,
+                "offsets": getattr(self, "offsets", {}),
+                "aggregation": getattr(self, "aggregation", AGGREGATION),
+                "general_data": encode_general(self.general_data)}
+        with open(os.path.join(folderpath, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file, indent=1)
+
+    # Loads log saved with save, arrays are memory mapped so percentiles and outliers are views into the files
+    @classmethod
+    def load(cls, folderpath, mmap_mode = "r"):
+        with open(os.path.join(folderpath, "meta.json"), "r", encoding="utf-8") as file:
+            meta = json.load(file)
+
+        log = cls.__new__(cls)
+        log.folderpath = meta["folderpath"]
+        log.general_filename = meta["general_filename"]
+        log.filenames = meta["filenames"]
+        log.key_ids = CATALOGUE.intern_keys(meta["keys"])
+        log.keys = [CATALOGUE.return_key(id) for id in log.key_ids]
+        log.general_data = decode_general(meta["general_data"])
+        log.offsets = meta.get("offsets", {})
+        log.aggregation = meta.get("aggregation", AGGREGATION)
+        log.sketches = {}
+
+        agg = np.load(os.path.join(folderpath, "agg.npy"), mmap_mode=mmap_mode)
+        present = np.load(os.path.join(folderpath, "present.npy"))
+        outliers = np.load(os.path.join(folderpath, "outliers.npy"), mmap_mode=mmap_mode)
+        offsets = np.load(os.path.join(folderpath, "outlier_offsets.npy"))
+        if os.path.exists(os.path.join(folderpath, "errors.npy")):
+            errors = np.load(os.path.join(folderpath, "errors.npy"))
+        else:
+            errors = np.zeros(present.shape)
+        if os.path.exists(os.path.join(folderpath, "outlier_counts.npy")):
+            counts = np.load(os.path.join(folderpath, "outlier_counts.npy"))
+        else:
+            counts = offsets[:, :, 1] - offsets[:, :, 0]
+
+        rows = []
+        for i in range(len(agg)):
+            agg_data = {}
+            outlier_data = {}
+            count_data = {}
+            error_data = {}
+            for j in np.flatnonzero(present[i]):
+                key = log.keys[j]
+                agg_data[key] = agg[i, j]
+                outlier_data[key] = outliers[offsets[i, j, 0]:offsets[i, j, 1]]
+                count_data[key] = int(counts[i, j])
+                error_data[key] = float(errors[i, j])
+            rows.append((agg_data, outlier_data, count_data, error_data))
+
+        log.agg_data = {filename: row[0] for filename, row in zip(log.filenames, rows)}
+        log.outliers = {filename: row[1] for filename, row in zip(log.filenames, rows)}
+        log.outlier_counts = {filename: row[2] for filename, row in zip(log.filenames, rows)}
+        log.errors = {filename: row[3] for filename, row in zip(log.filenames, rows)}
+        log.all_agg_data, log.all_outliers, log.all_outlier_counts, log.all_errors = rows[-1]
+
+        # Timelines are views into the memory mapped file of their type, logs saved before types were saved are float64
+        log.series = None
+        if os.path.exists(os.path.join(folderpath, "series_offsets.npy")):
+            offsets = np.load(os.path.join(folderpath, "series_offsets.npy"))
+            if os.path.exists(os.path.join(folderpath, "series_types.npy")):
+                types = np.load(os.path.join(folderpath, "series_types.npy"))
+                series = [np.load(os.path.join(folderpath, f"series_{dtype}.npy"), mmap_mode=mmap_mode) for dtype in SERIES_DTYPES]
+            else:
+                types = np.zeros(offsets.shape[:2], dtype=np.int8)
+                series = [np.load(os.path.join(folderpath, "series.npy"), mmap_mode=mmap_mode)]
+            log.series = {}
+            for i, filename in enumerate(log.filenames):
+                log.series[filename] = {}
+                for j in np.flatnonzero(offsets[i, :, 1] > offsets[i, :, 0]):
+                    log.series[filename][log.keys[j]] = series[types[i, j]][offsets[i, j, 0]:offsets[i, j, 1]]
+
+        # Pyramid levels are views into the memory mapped file, keys without levels are short timelines
+        log.pyramids = {}
+        if log.series is not None and os.path.exists(os.path.join(folderpath, "pyramid.npy")):
+            pyramid = np.load(os.path.join(folderpath, "pyramid.npy"), mmap_mode=mmap_mode)
+            levels = {}
+            for i, j, level, start, end in np.load(os.path.join(folderpath, "pyramid_offsets.npy")):
+                levels.setdefault((log.filenames[i], log.keys[j]), []).append((pyramid[start:end, 0], pyramid[start:end, 1]))
+            for filename in log.series:
+                log.pyramids[filename] = {key: Pyramid(array, levels.get((filename, key), [])) for key, array in log.series[filename].items()}
+        return log
+
+    # First type in SERIES_DTYPES that keeps the values of timeline, integers are kept exactly and
+    # other numbers to three decimals, which is a microsecond for timings in ms
+    @staticmethod
+    def series_dtype(array):
+        array = np.asarray(array)
+        if array.dtype.kind in "iu":
+            info = np.iinfo(np.int32)
+            if len(array) == 0 or (info.min <= array.min() and array.max() <= info.max):
+                return "int32"
+            return "int64"
+        with np.errstate(over="ignore"):
+            narrow = array.astype(np.float32).astype(np.float64)
+        if np.array_equal(np.round(narrow, 3), np.round(array.astype(np.float64), 3), equal_nan=True):
+            return "float32"
+        return "float64"
+
+    # Percentiles and relative error for all files together from log saved with save,
+    # only the last rows are read so it is fast for many logs
+    @staticmethod
+    def load_summary(folderpath):
+        with open(os.path.join(folderpath, "meta.json"), "r", encoding="utf-8") as file:
+            keys = json.load(file)["keys"]
+
+        agg = np.load(os.path.join(folderpath, "agg.npy"), mmap_mode="r")[-1]
+        present = np.load(os.path.join(folderpath, "present.npy"), mmap_mode="r")[-1]
+        if os.path.exists(os.path.join(folderpath, "errors.npy")):
+            errors = np.load(os.path.join(folderpath, "errors.npy"), mmap_mode="r")[-1]
+        else:
+            errors = np.zeros(len(keys))
+        return {keys[j]: (np.array(agg[j]), float(errors[j])) for j in np.flatnonzero(present)}
+
 #%% used for __init__
     # Convert text in files to dict
-    def import_file(self, filepath, general = False):
-        other = []
+    @staticmethod
+    def import_file(filepath, general = False):
+        with open_log(filepath) as file:
+
+            # If it is general log file we import a little differently
+            if general:
+                data = {}
+                for line in file:
+                    key, value = line.strip().split(":", 1)
+                    data[key] = value.strip()
+                return data, []
+        
+            return Log.parse_lines(file)
+
+    # Convert lines to dicts, chunk_lines lines at a time so the whole file is never in memory as text,
+    # lines can be any iterable such as an open file or a download
+    @staticmethod
+    def parse_chunks(lines, chunk_lines = CHUNK_LINES):
+        lines = iter(lines)
+        while True:
+            chunk = list(islice(lines, chunk_lines))
+            if not chunk:
+                break
+            data, _ = Log.parse_lines(chunk)
+            if data:
+                yield data
+
+    # Lines of file grouped by key with parse_block, about BLOCK_BYTES at a time so the whole file is never in memory
+    # Uncompressed files are memory mapped and parsed from byte start to end, None parses to the end of the file,
+    # compressed files are decompressed while reading and always parsed whole
+    @staticmethod
+    def import_blocks(filepath, start = 0, end = None):
+        if filepath.endswith(tuple(COMPRESSION_EXTENSIONS.values())):
+            yield from Log.import_stream(filepath)
+            return
+        with open(filepath, "rb") as file:
+            size = file.seek(0, os.SEEK_END)
+            end = size if end is None else min(end, size)
+            if end <= start:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = np.frombuffer(mm, dtype=np.uint8)
+                try:
+                    for block_start, block_end in LineIndex.block_ranges(mm, start, end):
+                        parsed = Log.parse_block(data[block_start:block_end])
+                        if parsed:
+                            yield parsed
+                finally:
+                    # The map can only be closed when no array uses it
+                    del data
+
+    # Lines of compressed file grouped by key with parse_block, read BLOCK_BYTES at a time
+    @staticmethod
+    def import_stream(filepath):
+        with open_log(filepath, True) as file:
+            rest = b""
+            while True:
+                chunk = file.read(BLOCK_BYTES)
+
+                # Blocks end after a newline so no line is split between blocks, the last line is parsed at the end
+                block = rest + chunk
+                if chunk:
+                    newline = block.rfind(b"\n")
+                    if newline < 0:
+                        rest = block
+                        continue
+                    block, rest = block[:newline + 1], block[newline + 1:]
+
+                if block:
+                    parsed = Log.parse_block(np.frombuffer(block, dtype=np.uint8))
+                    if parsed:
+                        yield parsed
+                if not chunk:
+                    break
+
+    # Same as parse_lines for whole lines in block, a uint8 array with the bytes of the lines
+    # Lines are grouped by key with numpy and the values of every key are decoded at once
+    @staticmethod
+    def parse_block(block):
+        key_ids = {}
+        starts, line_keys, value_starts = LineIndex.scan_block(block, 0, key_ids)
+        lines = np.flatnonzero(line_keys >= 0)
+        if len(lines) == 0:
+            return {}
+        line_keys = line_keys[lines]
+        value_starts = value_starts[lines]
+        value_ends = np.append(starts[1:], len(block))[lines]
+
+        # Whitespace and line endings around values are removed, a few bytes at most so this loops a few times
+        while True:
+            trailing = (value_ends > value_starts) & WHITESPACE[block[value_ends - 1]]
+            if not trailing.any():
+                break
+            value_ends -= trailing
+        while True:
+            leading = (value_starts < value_ends) & WHITESPACE[block[np.minimum(value_starts, len(block) - 1)]]
+            if not leading.any():
+                break
+            value_starts += leading
+
+        # Values copied after each other grouped by key, with a newline after every value
+        order = np.argsort(line_keys, kind="stable")
+        value_starts = value_starts[order]
+        lengths = value_ends[order] - value_starts + 1
+        positions = np.cumsum(lengths)
+        index = np.arange(positions[-1]) + np.repeat(value_starts - (positions - lengths), lengths)
+        text = block[np.minimum(index, len(block) - 1)]
+        text[positions - 1] = ord("\n")
+
         data = {}
+        start = 0
+        key_ends = positions[np.cumsum(np.bincount(line_keys, minlength=len(key_ids))) - 1]
+        for key, end in zip(key_ids, key_ends):
+            data[key] = text[start:end].tobytes().decode("utf-8", errors="replace").split("\n")[:-1]
+            start = end
+        return data
 
-        with open(filepath, "r", encoding="utf-8") as file:
-            for i,line in enumerate(file):
+    # Group lines by key
+    @staticmethod
+    def parse_lines(lines):
+        other = []
+        data = {}
+        for line in lines:
 
-                # If it is general log file we import a little differently
-                if general:
-                    key, value = line.strip().split(":", 1)
-                    self.general_data[key] = value.strip()
-                
-                # ':' represents data, otherwise it is just info and is put in 'other'
-                elif ':' in line:
-                    # Group data by key, the key is the string before the first ':'
-                    # For every key there is a list with the values
-                    key, value = line.strip().split(":", 1)
+            # ':' represents data, otherwise it is just info and is put in 'other'
+            if ':' in line:
+                # Group data by key, the key is the string before the first ':'
+                # For every key there is a list with the value strings, these are
+                # converted to numpy arrays column by column in format_data
+                key, _, value = line.partition(":")
 
-                    data.setdefault(key, []).append(value.strip())
+                data.setdefault(key.strip(), []).append(value.strip())
 
-                # If log data does not follow expected fomrat it is put in "other"
-                # Used for debugging
-                elif not line in other and filter == None:
-                    other.append(line)
+            # If log data does not follow expected fomrat it is put in "other"
+            # Used for debugging
+            elif not line in other and filter == None:
+                other.append(line)
         
         return data, other
 
+    # Same as parse_lines but also returns the loop iteration of every value and the number of iterations,
+    # a "Loop" line ends an iteration so the lines before it belong to the same frame
+    @staticmethod
+    def parse_iterations(lines):
+        data = {}
+        iterations = {}
+        iteration = 0
+        for line in lines:
+            if ':' in line:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                data.setdefault(key, []).append(value.strip())
+                iterations.setdefault(key, []).append(iteration)
+                if key == "Loop":
+                    iteration += 1
+        return data, iterations, iteration
+
+    # Structured array with one row for every loop iteration and a field for every key,
+    # keys are formatted as in format_data. Fields are float64 with nan if the key is missing or not a number in
+    # an iteration, unless the key is an integer in every iteration such as "Loop, count".
+    # If a key is in an iteration more than once the last value is kept.
+    # Lines after the last "Loop" line are not a whole iteration and are not included
+    @staticmethod
+    def format_iterations(data, iterations, count):
+        fields = {}
+        for key in data:
+            rows = np.array(iterations[key], dtype=np.int64)
+            for field, array in Log.format_data({key: data[key]}, True).items():
+                if len(array) == len(rows):
+                    fields[field] = (rows[rows < count], array[rows < count])
+
+        dtype = []
+        for field, (rows, array) in fields.items():
+            whole = array.dtype.kind == "i" and len(np.unique(rows)) == count
+            dtype.append((field, np.int64 if whole else np.float64))
+
+        records = np.zeros(count, dtype=dtype)
+        for field, (rows, array) in fields.items():
+            if records.dtype[field] == np.float64:
+                records[field] = np.nan
+            records[field][rows] = array
+        return records
+
     def format_general(self):
         
         for key in self.general_data:
@@ -163,50 +787,103 @@ class Log:
         # Change TIME to datetime object
         self.general_data["TIME"] = dt.datetime.strptime(self.general_data["TIME"], "%Y-%m-%d %H:%M:%S")
 
-    def convert_units_to_float(self, array, factor = 1):
-        time_list = []
-        for value in array:
-            split = value.split(" ")
+    # Converts list of strings to a typed numpy array, the numbers are parsed by numpy directly
+    # Values that are not numbers are removed, or nan if keep_invalid, returns None if no value is a number
+    @staticmethod
+    def convert_to_array(tokens, factor = 1, allow_int = True, keep_invalid = False):
+        if allow_int and not "." in tokens[0]:
             try:
-                time = float(split[0])
-                time_list.append(time/factor)
+                return np.array(tokens, dtype=np.int64)
             except ValueError:
-                # Used to debug formatting, should never be printed in real world use case
-                print("Could not convert to float:", split[0], "in", value)
+                pass
+        try:
+            array = np.array(tokens, dtype=np.float64)
+        except ValueError:
+            # Slow path, every value is tried so only the values that are not numbers are lost
+            valid = []
+            for token in tokens:
+                try:
+                    float(token)
+                    valid.append(True)
+                except ValueError:
+                    valid.append(False)
+
+            # Used to debug formatting, should never be printed in real world use case
+            if __debug__:
+                print(f"Could not convert {valid.count(False)} values to numbers, example value:", tokens[valid.index(False)])
+            if not any(valid):
+                return None
+            if not keep_invalid:
+                return Log.convert_to_array([token for token, ok in zip(tokens, valid) if ok], factor, allow_int)
+            array = np.array([token if ok else "nan" for token, ok in zip(tokens, valid)], dtype=np.float64)
+
+        if factor != 1:
+            array /= factor
+        return array
 
-        return time_list
+    # Returns first word of every value, used to separate value from unit
+    @staticmethod
+    def first_words(array):
+        # Fast path when all values are "value unit", the units must be the same in every row
+        # since rows with one and three words also give twice as many words
+        words = " ".join(array).split()
+        if len(words) == 2 * len(array) and len(set(words[1::2])) == 1:
+            return words[::2]
+        return [value.split()[0] if value.strip() else value for value in array]
 
-    # formats data into dicts for plotting
-    def format_data(self, data):
+    # Splits ["aaa=bb, ccc=dd"] into {"aaa" : ["bb"], "ccc" : ["dd"]}
+    @staticmethod
+    def split_subkeys(array):
+        fields = ",".join(array).split(",")
+        field_count = len(array[0].split(","))
 
-        # If data is {"key" : ["aaa=bb, ccc=dd"]} split into {"key, aaa" : "bb", "key, ccc" : "dd"}
+        # Fast path when all lines have the same subkeys in the same order
+        if len(fields) == field_count * len(array):
+            columns = {}
+            for i in range(field_count):
+                split = "=".join(fields[i::field_count]).split("=")
+                subkeys = set(split[::2])
+                if len(split) != 2 * len(array) or len(subkeys) != 1:
+                    break
+                columns[subkeys.pop().strip()] = split[1::2]
+            else:
+                return columns
+
+        columns = {}
+        for value in array:
+            for item in value.split(","):
+                subkey, value = item.split("=")
+                columns.setdefault(subkey.strip(), []).append(value)
+        return columns
+
+    # formats data into dicts with numpy arrays for plotting, see convert_to_array for keep_invalid
+    @staticmethod
+    def format_data(data, keep_invalid = False):
+
+        # If data is {"key" : ["aaa=bb, ccc=dd"]} split into {"key, aaa" : ["bb"], "key, ccc" : ["dd"]}
         keys = list(data.keys())
         for key in keys:
             if "=" in data[key][0]:
-                split_lists = list(map(lambda item: item.split(","), data[key]))
-                for sublist in split_lists:
-                    for item in sublist:
-                        subkey, value = item.split("=")
-                        subkey = subkey.strip()
-                        data.setdefault(key + ", " + subkey, []).append(value)
+                for subkey, array in Log.split_subkeys(data[key]).items():
+                    data.setdefault(key + ", " + subkey, []).extend(array)
                 del data[key]
         
         # Convert elements to usable values for plotting
         values = {}
-        keys = list(data.keys())
-        for key in keys:
+        for key in data:
             # Assume all values follow same format
-            first_split_space = data[key][0].split(" ")
-            first_split_space_value = try_int_float_convert(first_split_space[0])
-            is_int_or_float = isinstance(first_split_space_value, (int, float))
+            first_split_space = data[key][0].split()
+            if len(first_split_space) == 0:
+                continue
 
             # Value cannot be split so we try to convert to int or float
             if len(first_split_space) == 1:
-                for i in data[key]:
-                    values.setdefault(key, []).append(try_int_float_convert(i))
+                array = Log.convert_to_array(data[key], keep_invalid=keep_invalid)
+                if array is not None:
+                    values[key] = array
 
             # Assume the second is a unit
-            elif len(first_split_space) == 2 and is_int_or_float:
+            elif len(first_split_space) == 2:
                 unit = first_split_space[1]
                 factor = 1
                 if unit == "us":
@@ -215,71 +892,197 @@ class Log:
                 if unit == "ns":
                     factor = 1000000
                     unit = "ms"
-                values[f"{key} ({unit})"] = self.convert_units_to_float(data[key], factor)
+
+                # Value with unit is always a float
+                array = Log.convert_to_array(Log.first_words(data[key]), factor, False, keep_invalid)
+                if array is not None:
+                    values[f"{key} ({unit})"] = array
         
         # Calculate framerate with loop time
         if "Loop, Duration (ms)" in values.keys():
-            for i in values["Loop, Duration (ms)"]:
-                framerate = 1000 / i
-                values.setdefault("Framerate (Hz)", []).append(framerate)
+            with np.errstate(divide="ignore"):
+                values["Framerate (Hz)"] = 1000 / values["Loop, Duration (ms)"]
 
         return values
 
+    @staticmethod
+    def use_exact(count, aggregation):
+        if aggregation["mode"] == "auto":
+            return count <= aggregation["exact_limit"]
+        return aggregation["mode"] == "exact"
+
+    # Aggregate values exactly or with sketches depending on aggregation mode
+    # Returns aggregated values, kept outliers, number of outliers and relative error for every key
+    @staticmethod
+    def aggregate_values(values, sketches, aggregation):
+        exact_values = {}
+        for key in values:
+            if not key in sketches or Log.use_exact(len(values[key]), aggregation):
+                exact_values[key] = values[key]
+
+        aggregated_values, outliers = Log.aggregate(exact_values)
+        outlier_counts = {key: len(outliers[key]) for key in outliers}
+        errors = {key: 0.0 for key in aggregated_values}
+
+        for key in sketches:
+            if key in exact_values or sketches[key].count == 0:
+                continue
+            aggregated_values[key], outliers[key], outlier_counts[key] = Log.aggregate_sketch(sketches[key])
+            errors[key] = sketches[key].return_error()
+
+        for key in outliers:
+            # Limits only depend on the quartiles so they are the same for the clamped percentiles
+            limits = Log.whiskers(np.array(aggregated_values[key], dtype=np.float64))
+            outliers[key] = Log.retain_outliers(outliers[key], limits, aggregation)
+
+        return aggregated_values, outliers, outlier_counts, errors
+
+    # Keeps the lowest outliers below the lower whisker, the highest above the upper whisker and an evenly
+    # spread sample of the ones in between. Outliers are sorted so the sample is stratified over the range of outliers
+    # limits are the whisker limits from whiskers
+    @staticmethod
+    def retain_outliers(outliers, limits, aggregation):
+        extremes = aggregation["outlier_extremes"]
+        samples = aggregation["outlier_samples"]
+        if extremes < 0 or len(outliers) <= 2 * extremes + samples:
+            return outliers
+
+        # Outliers before low_end are below the lower whisker and from high_start above the upper whisker
+        low_end = np.searchsorted(outliers, limits[0])
+        high_start = np.searchsorted(outliers, limits[1], side="right")
+        low = outliers[:min(extremes, low_end)]
+        high = outliers[max(len(outliers) - extremes, high_start):]
+
+        middle = outliers[len(low):len(outliers) - len(high)]
+        sample = middle[np.linspace(0, len(middle) - 1, samples).astype(np.int64)]
+        return np.concatenate([low, sample, high])
+
+    # Same as aggregate but from a sketch, outliers are the values of sketch buckets outside the whiskers
+    # Returns the number of outliers as well since a bucket can have many values
+    @staticmethod
+    def aggregate_sketch(sketch):
+        aggregated_values = np.array([sketch.min, *sketch.quantile([0.25, 0.5, 0.75]), sketch.max])
+        min_limit, max_limit = Log.whiskers(aggregated_values)
+
+        bucket_values, bucket_counts = sketch.buckets()
+        mask = (bucket_values < min_limit) | (bucket_values > max_limit)
+        return aggregated_values, bucket_values[mask], int(bucket_counts[mask].sum())
+
     # Aggregate data (calculate percentiles)
-    def aggregate(self, data):
+    # Values are not sorted or changed, outliers are found with a boolean mask
+    @staticmethod
+    def aggregate(data):
         aggregated_values = {}
         outliers = {}
         for key in data:
-            try:
-                # Throws an exception for TypeError if data in wrong format, just skip these datapoints then
-                aggregated_values[key] = list(np.percentile(data[key], [0, 25, 50, 75, 100]))
-            except TypeError as e:
+            values = np.asarray(data[key])
+
+            # Just skip keys where data is in wrong format
+            if len(values) == 0 or not np.issubdtype(values.dtype, np.number):
                 # Only important when debugging
                 if __debug__:
-                    print(f"Error processing key '{key}' with example value '{data[key][0]}': {type(e).__name__}: {e}")
+                    print(f"Error processing key '{key}' with dtype '{values.dtype}'")
                 continue
 
-            data[key].sort()
-            outliers[key] = []
-
-            min = aggregated_values[key][0]
-            Q1 = aggregated_values[key][1]
-            Q3 = aggregated_values[key][3]
-            max = aggregated_values[key][4]
-
-            IQR = Q3 - Q1
-
-            # Outliers as defined by seaborn library for python
-            min_limit = Q1 - 1.5 * IQR
-            if min < min_limit:
-                aggregated_values[key][0] = min_limit
+            # All percentiles are found with one partition of the values
+            aggregated_values[key] = np.percentile(values, [0, 25, 50, 75, 100])
+            min_limit, max_limit = Log.whiskers(aggregated_values[key])
 
-                # Add outliers to dict
-                lower_index = bisect.bisect_left(data[key], min_limit)
-                outliers[key].extend(data[key][:lower_index])
-            
-            max_limit = Q3 + 1.5 * IQR
-            if max > max_limit:
-                aggregated_values[key][4] = max_limit
-
-                # Add outliers to dict
-                upper_index = bisect.bisect_right(data[key], max_limit)
-                outliers[key].extend(data[key][upper_index:])
+            mask = (values < min_limit) | (values > max_limit)
+            outliers[key] = np.sort(values[mask]).astype(np.float64)
 
         return aggregated_values, outliers
+
+    # Outliers as defined by seaborn library for python, 1.5 * IQR outside the box
+    # Clamps min and max in percentiles to the limits and returns the limits
+    @staticmethod
+    def whiskers(percentiles):
+        IQR = percentiles[3] - percentiles[1]
+        min_limit = percentiles[1] - 1.5 * IQR
+        max_limit = percentiles[3] + 1.5 * IQR
+        percentiles[0] = np.maximum(percentiles[0], min_limit)
+        percentiles[4] = np.minimum(percentiles[4], max_limit)
+        return min_limit, max_limit
     
+    # Keys in file that formatted keys are made from, "Loop, Duration (ms)" is made from "Loop"
+    @staticmethod
+    def raw_keys(keys, file_keys):
+        raw = set()
+        for key in keys:
+            if key == "Framerate (Hz)":
+                key = "Loop, Duration (ms)"
+            for file_key in file_keys:
+                if key == file_key or key.startswith(file_key + " (") or key.startswith(file_key + ", "):
+                    raw.add(file_key)
+        return list(raw)
+
+    # Timelines for keys in filter, from cache, saved series or by parsing the file
     def return_timeline(self, filter, filename):
+        filtered_data = {}
+        missing = []
+        for key in filter:
+            array = Log.timeline_cache.get((self.return_folder_name(), filename, key))
+            if array is None:
+                missing.append(key)
+            else:
+                filtered_data[key] = array
+        if not missing:
+            return filtered_data
 
-        filepath = os.path.join(self.folderpath, filename)
-        try:
-            data, _ = self.import_file(filepath)
-        except FileNotFoundError as e:
-            return {}
-        data = self.format_data(data)
+        # Logs imported before timelines were saved have to parse the file,
+        # uncompressed files only parse lines with the keys using the line index
+        series = getattr(self, "series", None)
+        if series is not None:
+            data = series.get(filename, {})
+        else:
+            filepath = find_log(self.folderpath, filename)
+            try:
+                if filepath == os.path.join(self.folderpath, filename):
+                    index = LineIndex(filepath)
+                    data, _ = self.parse_lines(index.read_lines(self.raw_keys(missing, index.return_keys())))
+                else:
+                    data, _ = self.import_file(filepath)
+            except FileNotFoundError as e:
+                return filtered_data
+            data = self.format_data(data)
 
-        filtered_data = {}
-        for key in data:
-            if key in filter:
-                filtered_data[key] = data[key]
+        for key in missing:
+            if key in data:
+                filtered_data[key] = np.array(data[key])
+                Log.timeline_cache.put((self.return_folder_name(), filename, key), filtered_data[key])
         
         return filtered_data
+
+#%% Iterations
+    # Values of every loop iteration in file as a structured array, see format_iterations.
+    # Made from the file when first used since timelines do not keep which iteration a value is from,
+    # None if the file cannot be found
+    def return_iterations(self, filename):
+        records = Log.timeline_cache.get(("iterations", self.return_folder_name(), filename))
+        if records is None:
+            try:
+                with open_log(find_log(self.folderpath, filename)) as file:
+                    records = self.format_iterations(*self.parse_iterations(file))
+            except FileNotFoundError:
+                return None
+            Log.timeline_cache.put(("iterations", self.return_folder_name(), filename), records)
+        return records
+
+    # Mean of stages for iterations sorted by loop duration in buckets, shows which stages make frames slow.
+    # Returns percentile of loop duration at the middle of every bucket, (buckets, stages) mean of every stage
+    # with missing values as 0 and the mean loop duration, None if iterations do not have loop durations
+    @staticmethod
+    def stage_breakdown(records, stages, buckets = 100):
+        if not "Loop, Duration (ms)" in records.dtype.names or len(records) == 0:
+            return None
+        order = np.argsort(records["Loop, Duration (ms)"], kind="stable")
+        buckets = min(buckets, len(order))
+        starts = np.arange(buckets) * len(order) // buckets
+        counts = np.diff(np.append(starts, len(order)))
+
+        def bucket_means(values):
+            return np.add.reduceat(np.nan_to_num(values[order].astype(np.float64)), starts) / counts
+
+        x = (starts + counts / 2) / len(order) * 100
+        means = np.column_stack([bucket_means(records[stage]) for stage in stages] or [np.zeros((buckets, 0))])
+        return x, means, bucket_means(records["Loop, Duration (ms)"])
@@ -0,0 +1,107 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import numpy as np
+
+# Number of buckets that are combined into one bucket in the next level
+FACTOR = 16
+
+# Levels are added until a level has at most this many buckets
+TOP_BUCKETS = 2048
+
+#%% Min and max pyramid
+# Downsamples a timeline for plotting by keeping the min and max of every bucket so no peak is lost
+# Level k has the min and max of every FACTOR ** (k + 1) values, levels are made when the log is
+# imported so a timeline with millions of values can be downsampled to any range instantly
+class Pyramid:
+    # levels is a list of (mins, maxs), made from values if None
+    def __init__(self, values, levels = None):
+        self.values = values
+        self.levels = self.build(values) if levels is None else levels
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def build(values):
+        levels = []
+        mins = maxs = np.asarray(values, dtype=np.float64)
+        while len(mins) > TOP_BUCKETS:
+            mins, maxs = Pyramid.combine(mins, maxs, FACTOR)
+            levels.append((mins, maxs))
+        return levels
+
+    # Pyramid of values that start with the values of this pyramid, only buckets with new values are made
+    # so a growing timeline does not make all levels again
+    def extend(self, values):
+        count = len(self.values)
+        levels = []
+        mins = maxs = values
+        size = 1
+        while len(mins) > TOP_BUCKETS:
+            # Buckets before first only have old values and are kept, levels that are new are made whole
+            size *= FACTOR
+            first = count // size if len(levels) < len(self.levels) else 0
+            new_mins, new_maxs = self.combine(np.asarray(mins[first * FACTOR:], dtype=np.float64),
+                                              np.asarray(maxs[first * FACTOR:], dtype=np.float64), FACTOR)
+            if first:
+                old_mins, old_maxs = self.levels[len(levels)]
+                new_mins = np.concatenate([old_mins[:first], new_mins])
+                new_maxs = np.concatenate([old_maxs[:first], new_maxs])
+            mins, maxs = new_mins, new_maxs
+            levels.append((mins, maxs))
+        return Pyramid(values, levels)
+
+    # Min and max of every size buckets, the last bucket can be smaller
+    # nan is ignored unless all values in a bucket are nan
+    @staticmethod
+    def combine(mins, maxs, size):
+        starts = np.arange(0, len(mins), size)
+        return np.fmin.reduceat(mins, starts), np.fmax.reduceat(maxs, starts)
+
+    # x and y to plot values from start to end with at most 2 * buckets points
+    # Every bucket is plotted as its min and max at the middle of the bucket,
+    # all values are plotted if there are not more values than points
+    def downsample(self, start, end, buckets):
+        start = max(0, int(np.floor(start)))
+        end = min(len(self.values), int(np.ceil(end)) + 1)
+        if end <= start:
+            return np.zeros(0), np.zeros(0)
+        if end - start <= 2 * buckets:
+            return np.arange(start, end), np.asarray(self.values[start:end], dtype=np.float64)
+
+        # Coarsest level that still has more buckets than needed in the range
+        size = 1
+        mins = maxs = self.values
+        for level_mins, level_maxs in self.levels:
+            if (end - start) // (size * FACTOR) < buckets:
+                break
+            size *= FACTOR
+            mins, maxs = level_mins, level_maxs
+
+        first = start // size
+        last = -(-end // size)
+        step = -(-(last - first) // buckets)
+        mins, maxs = self.combine(np.asarray(mins[first:last], dtype=np.float64),
+                                  np.asarray(maxs[first:last], dtype=np.float64), step)
+
+        # Middle of every bucket, the last bucket can end before the others
+        bucket_starts = (first + np.arange(len(mins)) * step) * size
+        bucket_ends = np.minimum(bucket_starts + step * size, len(self.values))
+        x = (bucket_starts + bucket_ends - 1) / 2
+        return np.repeat(x, 2), np.column_stack([mins, maxs]).ravel()
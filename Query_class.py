@@ -0,0 +1,190 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import json
+import fnmatch
+import operator
+import datetime as dt
+import numpy as np
+
+#%% Custom modules
+from functions import try_int_float_convert
+
+#%% Query over all logs
+# Selects logs by their general data and keys by pattern and returns a table with the percentiles
+# of all files in every log. Percentiles of all logs are kept in an index in the store folder so
+# logs do not have to be loaded, only logs written since the index was saved are read:
+#   index.json  names of logs and when they were written, keys
+#   agg.npy     float64 (logs, keys, 5) percentiles, nan if key is missing
+#   errors.npy  float64 (logs, keys) relative error of percentiles, 0 if exact
+class Query:
+    # Operators in conditions, two character operators first so ">=" is not read as ">"
+    operators = {">=": operator.ge, "<=": operator.le, "!=": operator.ne,
+                 "=": operator.eq, ">": operator.gt, "<": operator.lt}
+
+    # Columns in result, general data first
+    general_headers = ["ID", "TIME", "VERSION", "COMMENT"]
+    value_headers = ["Min", "Q1", "Median", "Q3", "Max", "Error"]
+
+    def __init__(self, store):
+        self.store = store
+        self.folderpath = os.path.join(store.folderpath, "query")
+
+        self.names = []
+        self.stamps = []
+        self.keys = []
+        self.agg = np.zeros((0, 0, 5))
+        self.errors = np.zeros((0, 0))
+        self.columns = {}   # General data attribute: value for every log, None if missing
+
+        self.refresh()
+
+#%% Index
+    # Reads logs that are new or written again since the index was saved
+    def refresh(self):
+        self.load()
+        rows = {name: i for i, name in enumerate(self.names)}
+        stamps = [self.store.return_stamp(name) for name in self.store.names]
+
+        summaries = {}
+        for name, stamp in zip(self.store.names, stamps):
+            if not name in rows or self.stamps[rows[name]] != stamp:
+                summaries[name] = self.store.return_summary(name)
+
+        if summaries or self.names != self.store.names:
+            keys = list(dict.fromkeys(self.keys + [key for summary in summaries.values() for key in summary]))
+            key_index = {key: j for j, key in enumerate(keys)}
+            agg = np.full((len(stamps), len(keys), 5), np.nan)
+            errors = np.zeros((len(stamps), len(keys)))
+            for i, name in enumerate(self.store.names):
+                if name in summaries:
+                    for key, (percentiles, error) in summaries[name].items():
+                        agg[i, key_index[key]] = percentiles
+                        errors[i, key_index[key]] = error
+                else:
+                    agg[i, :len(self.keys)] = self.agg[rows[name]]
+                    errors[i, :len(self.keys)] = self.errors[rows[name]]
+
+            self.names = list(self.store.names)
+            self.stamps = stamps
+            self.keys = keys
+            self.agg = agg
+            self.errors = errors
+            self.save()
+
+        self.columns = {}
+
+    # Index that cannot be read is made again
+    def load(self):
+        try:
+            with open(os.path.join(self.folderpath, "index.json"), "r", encoding="utf-8") as file:
+                index = json.load(file)
+            agg = np.load(os.path.join(self.folderpath, "agg.npy"))
+            errors = np.load(os.path.join(self.folderpath, "errors.npy"))
+        except (OSError, ValueError):
+            return
+        if agg.shape != (len(index["names"]), len(index["keys"]), 5) or errors.shape != agg.shape[:2]:
+            return
+
+        self.names = index["names"]
+        self.stamps = index["stamps"]
+        self.keys = index["keys"]
+        self.agg = agg
+        self.errors = errors
+
+    def save(self):
+        os.makedirs(self.folderpath, exist_ok=True)
+        np.save(os.path.join(self.folderpath, "agg.npy"), self.agg)
+        np.save(os.path.join(self.folderpath, "errors.npy"), self.errors)
+        with open(os.path.join(self.folderpath, "index.json"), "w", encoding="utf-8") as file:
+            json.dump({"names": self.names, "stamps": self.stamps, "keys": self.keys}, file, indent=1)
+
+    # Value of general data attribute for every log
+    def column(self, attribute):
+        if not attribute in self.columns:
+            values = [self.store.general[name].get(attribute) for name in self.names]
+            self.columns[attribute] = np.empty(len(values), dtype=object)
+            self.columns[attribute][:] = values
+        return self.columns[attribute]
+
+#%% Conditions
+    # Reads condition like "FPS>=30" to (attribute, operator, value)
+    # Values are converted like general data, TIME can be a date or date and time
+    @classmethod
+    def parse_condition(cls, text):
+        for symbol in cls.operators:
+            if symbol in text:
+                attribute, _, value = text.partition(symbol)
+                attribute = attribute.strip()
+                value = value.strip()
+                break
+        else:
+            raise ValueError(f"No operator in condition '{text}', use one of {' '.join(cls.operators)}")
+
+        if attribute == "TIME":
+            for format in ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"]:
+                try:
+                    return attribute, symbol, dt.datetime.strptime(value, format)
+                except ValueError:
+                    pass
+            raise ValueError(f"TIME must be written as YYYY-MM-DD or YYYY-MM-DD HH:MM:SS, not '{value}'")
+        return attribute, symbol, try_int_float_convert(value)
+
+    # True for every log where condition holds, logs without the attribute never match
+    def match(self, attribute, symbol, value):
+        compare = self.operators[symbol]
+        column = self.column(attribute)
+        mask = np.zeros(len(column), dtype=bool)
+        for i, item in enumerate(column):
+            try:
+                mask[i] = item is not None and bool(compare(item, value))
+            except TypeError:
+                pass
+        return mask
+
+    # Keys matching any of the patterns, * matches anything, patterns can be separated with ';'
+    def match_keys(self, patterns):
+        if isinstance(patterns, str):
+            patterns = patterns.split(";")
+        patterns = [pattern.strip() for pattern in patterns]
+        return [j for j, key in enumerate(self.keys) if any(fnmatch.fnmatchcase(key, pattern) for pattern in patterns)]
+
+#%% Select
+    # Percentiles for keys matching patterns in logs where all conditions hold
+    # conditions are (attribute, operator, value) like ("FPS", ">=", 30) or ("TIME", "<", datetime)
+    # Returns one row for every log and key as a dict with general_headers, "Key" and value_headers
+    def select(self, conditions = [], patterns = "*"):
+        mask = np.ones(len(self.names), dtype=bool)
+        for attribute, symbol, value in conditions:
+            mask &= self.match(attribute, symbol, value)
+        logs = np.flatnonzero(mask)
+        keys = np.array(self.match_keys(patterns), dtype=np.int64)
+
+        agg = self.agg[np.ix_(logs, keys)]
+        errors = self.errors[np.ix_(logs, keys)]
+        rows = []
+        for i, j in zip(*np.nonzero(~np.isnan(agg[:, :, 2]))):
+            general = self.store.general[self.names[logs[i]]]
+            row = {"ID": int(logs[i]) + 1}
+            for attribute in self.general_headers[1:]:
+                row[attribute] = general.get(attribute, "")
+            row["Key"] = self.keys[keys[j]]
+            row.update(zip(self.value_headers, [*agg[i, j].tolist(), float(errors[i, j])]))
+            rows.append(row)
+        return rows
@@ -0,0 +1,132 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import json
+import html
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+#%% Classes
+from Store_class import Store
+
+#%% Report
+FORMATS = ["png", "svg"]
+REPORT_VERSION = 1  # Increase when figures are drawn differently so cached figures are not reused
+
+# Draws one figure in a worker process, logs are loaded from the store by the worker so only names are sent.
+# The figure is saved to a temporary file first so a figure that was not finished is never reused
+def render_figure(store_folder, kind, names, keys, filename, filepath):
+    import matplotlib
+    matplotlib.use("Agg")   # No window is needed, also works without a display
+    from Data_class import Data
+
+    store = Store(store_folder)
+    comp = [store.load(name) for name in names]
+
+    base, extension = os.path.splitext(filepath)
+    temp_filepath = base + ".tmp" + extension
+    if kind == "boxplot":
+        Data.display_combined(comp, keys, temp_filepath)
+    else:
+        Data.display_timeline(comp, keys, filename, temp_filepath)
+    os.replace(temp_filepath, filepath)
+    return filepath
+
+# Box plots of every key and timelines of every key in every camera file for some logs,
+# saved as images with an index.html that shows all of them.
+# The name of a figure is a hash of the logs, when they were written, the keys and the file,
+# so figures that exist in the folder are unchanged and are reused instead of drawn again
+class Report:
+    def __init__(self, store, folderpath, format = "png"):
+        if not format in FORMATS:
+            raise ValueError(f"Format must be one of {', '.join(FORMATS)}, not {format}")
+        self.store = store
+        self.folderpath = folderpath
+        self.format = format
+
+    # Name of image file for figure
+    def figure_filename(self, kind, names, keys, filename = None):
+        stamps = [self.store.return_stamp(name) for name in names]
+        text = json.dumps([REPORT_VERSION, __debug__, kind, names, stamps, keys, filename])
+        return f"{kind}_{hashlib.sha256(text.encode()).hexdigest()[:16]}.{self.format}"
+
+    # Figures in report, a box plot for every key and a timeline for every key in every camera file
+    def figures(self, names, keys):
+        comp = [self.store.load(name) for name in names]
+        figures = [{"kind": "boxplot", "keys": [key], "filename": None, "title": key} for key in keys]
+
+        filenames = sorted({filename for log in comp for filename in log.return_filenames()})
+        for filename in filenames:
+            for key in keys:
+                if any(self.has_key(log, filename, key) for log in comp):
+                    figures.append({"kind": "timeline", "keys": [key], "filename": filename, "title": f"{filename}: {key}"})
+
+        for figure in figures:
+            figure["figure"] = self.figure_filename(figure["kind"], names, figure["keys"], figure["filename"])
+        return figures
+
+    @staticmethod
+    def has_key(log, filename, key):
+        try:
+            log.return_agg_data(filename, key)
+            return True
+        except KeyError:
+            return False
+
+    # Draws figures that are not in folder and writes index.html, returns number of drawn and reused figures.
+    # Figures are always drawn in worker processes so the backend of plots shown by the menu is not changed
+    def render(self, names, keys, workers = 1):
+        os.makedirs(self.folderpath, exist_ok=True)
+        figures = self.figures(names, keys)
+        missing = [figure for figure in figures if not os.path.exists(os.path.join(self.folderpath, figure["figure"]))]
+
+        if missing:
+            with ProcessPoolExecutor(max(1, min(workers, len(missing)))) as executor:
+                futures = [executor.submit(render_figure, self.store.folderpath, figure["kind"], names,
+                                           figure["keys"], figure["filename"], os.path.join(self.folderpath, figure["figure"]))
+                           for figure in missing]
+                for future in futures:
+                    future.result()
+
+        self.write_index(names, figures)
+        return len(missing), len(figures) - len(missing)
+
+    # Page with table of logs and all figures
+    def write_index(self, names, figures):
+        rows = []
+        for name in names:
+            general = self.store.general.get(name, {})
+            cells = [str(general.get(attribute, "")) for attribute in ["TIME", "VERSION", "COMMENT"]]
+            rows.append("<tr>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in cells) + "</tr>")
+
+        sections = []
+        for kind, heading in [("boxplot", "Box plots"), ("timeline", "Timelines")]:
+            images = [f'<h3>{html.escape(figure["title"])}</h3>\n<img src="{html.escape(figure["figure"])}" alt="{html.escape(figure["title"])}">'
+                      for figure in figures if figure["kind"] == kind]
+            if images:
+                sections.append(f"<h2>{heading}</h2>\n" + "\n".join(images))
+
+        page = ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>GulliView logs report</title>\n"
+                "<style>table, td, th {border: 1px solid gray; border-collapse: collapse; padding: 4px} img {max-width: 100%}</style>\n"
+                "</head>\n<body>\n<h1>GulliView logs report</h1>\n"
+                "<table>\n<tr><th>TIME</th><th>VERSION</th><th>COMMENT</th></tr>\n" + "\n".join(rows) + "\n</table>\n"
+                + "\n".join(sections) + "\n</body>\n</html>\n")
+
+        with open(os.path.join(self.folderpath, "index.html"), "w", encoding="utf-8") as file:
+            file.write(page)
@@ -0,0 +1,141 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import numpy as np
+
+#%% Mergeable quantile sketch
+# Values are counted in logarithmic buckets so every quantile is within a relative error
+# of 'accuracy' from the true value (DDSketch). Sketches are filled while a file is read and
+# sketches from different files can be merged without keeping the values.
+class QuantileSketch:
+    # Values closer to zero than this are counted as zero
+    min_value = 1e-9
+
+    def __init__(self, accuracy = 0.01):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = np.log(self.gamma)
+
+        # Counts in buckets for positive and negative values, offset is index of first bucket
+        self.positive = np.zeros(0, dtype=np.int64)
+        self.positive_offset = 0
+        self.negative = np.zeros(0, dtype=np.int64)
+        self.negative_offset = 0
+        self.zeros = 0
+
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    # Relative error of quantiles
+    def return_error(self):
+        return self.accuracy
+
+#%% Add and merge
+    # Add numpy array of values, nan and inf are ignored
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        positive = values[values >= self.min_value]
+        negative = -values[values <= -self.min_value]
+        self.zeros += len(values) - len(positive) - len(negative)
+
+        self.positive, self.positive_offset = self.add_counts(self.positive, self.positive_offset, self.index(positive))
+        self.negative, self.negative_offset = self.add_counts(self.negative, self.negative_offset, self.index(negative))
+
+    # Add other sketch with same accuracy to this one
+    def merge(self, other):
+        if other.accuracy != self.accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zeros += other.zeros
+
+        self.positive, self.positive_offset = self.merge_counts(self.positive, self.positive_offset, other.positive, other.positive_offset)
+        self.negative, self.negative_offset = self.merge_counts(self.negative, self.negative_offset, other.negative, other.negative_offset)
+
+    def index(self, values):
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    # Value in middle of bucket, relative error to all values in bucket is at most accuracy
+    def value(self, indexes):
+        return 2 * self.gamma ** indexes / (self.gamma + 1)
+
+    @staticmethod
+    def add_counts(counts, offset, indexes):
+        if len(indexes) == 0:
+            return counts, offset
+        low = indexes.min()
+        high = indexes.max()
+        counts, offset = QuantileSketch.extend(counts, offset, low, high)
+        counts += np.bincount(indexes - offset, minlength=len(counts))
+        return counts, offset
+
+    @staticmethod
+    def merge_counts(counts, offset, other_counts, other_offset):
+        if len(other_counts) == 0:
+            return counts, offset
+        counts, offset = QuantileSketch.extend(counts, offset, other_offset, other_offset + len(other_counts) - 1)
+        start = other_offset - offset
+        counts[start:start + len(other_counts)] += other_counts
+        return counts, offset
+
+    # Makes counts cover bucket indexes from low to high
+    @staticmethod
+    def extend(counts, offset, low, high):
+        if len(counts) == 0:
+            return np.zeros(high - low + 1, dtype=np.int64), low
+        new_offset = min(offset, low)
+        new_end = max(offset + len(counts) - 1, high)
+        if new_offset == offset and new_end == offset + len(counts) - 1:
+            return counts, offset
+        return np.pad(counts, (offset - new_offset, new_end - (offset + len(counts) - 1))), new_offset
+
+#%% Quantiles
+    # Values and counts of all non empty buckets in ascending order
+    def buckets(self):
+        negative_indexes = np.flatnonzero(self.negative)[::-1]
+        positive_indexes = np.flatnonzero(self.positive)
+
+        values = np.concatenate([-self.value(negative_indexes + self.negative_offset),
+                                 np.zeros(1 if self.zeros else 0),
+                                 self.value(positive_indexes + self.positive_offset)])
+        counts = np.concatenate([self.negative[negative_indexes],
+                                 np.full(1 if self.zeros else 0, self.zeros, dtype=np.int64),
+                                 self.positive[positive_indexes]])
+
+        # Min and max are known exactly
+        return np.clip(values, self.min, self.max), counts
+
+    # Quantiles for q between 0 and 1, same rank as numpy percentile
+    def quantile(self, q):
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)
+        values, counts = self.buckets()
+        ranks = np.asarray(q) * (self.count - 1)
+        indexes = np.searchsorted(np.cumsum(counts), ranks, side="right")
+        return values[np.minimum(indexes, len(values) - 1)]
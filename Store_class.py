@@ -0,0 +1,182 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+#%% Standard modules
+import os
+import json
+import pickle
+import shutil
+import numpy as np
+
+#%% Custom modules
+from functions import encode_general
+from functions import decode_general
+
+#%% Classes
+from Log_class import Log
+
+#%% Store for imported logs
+# Every log is saved in its own folder in the runs folder and is only loaded when used.
+# The index keeps the order of the logs and their general data so they can be listed
+# without loading any log.
+class Store:
+    def __init__(self, folderpath):
+        self.folderpath = folderpath
+        self.runs_folder = os.path.join(folderpath, "runs")
+        self.index_filepath = os.path.join(folderpath, "index.json")
+
+        self.names = []         # Names of logs in order, same as name of archive folder
+        self.general = {}       # General data for every log
+        self.properties = {}
+        self.loaded = {}        # Logs that have been loaded from disk
+
+    def __len__(self):
+        return len(self.names)
+
+    # Loads log on first access
+    def __getitem__(self, i):
+        return self.load(self.names[i])
+
+#%% Index
+    def exists(self):
+        return os.path.exists(self.index_filepath)
+
+    def open(self):
+        with open(self.index_filepath, "r", encoding="utf-8") as file:
+            index = json.load(file)
+
+        self.properties = index["properties"]
+        self.names = []
+        self.general = {}
+        for run in index["runs"]:
+            self.names.append(run["name"])
+            self.general[run["name"]] = decode_general(run["general"])
+
+    # Index is written to a temporary file first so it is never left half written
+    def save(self):
+        os.makedirs(self.runs_folder, exist_ok=True)
+
+        index = {"properties": self.properties, "runs": []}
+        for name in self.names:
+            index["runs"].append({"name": name, "general": encode_general(self.general[name])})
+
+        temp_filepath = self.index_filepath + ".tmp"
+        with open(temp_filepath, "w", encoding="utf-8") as file:
+            json.dump(index, file, indent=1)
+        os.replace(temp_filepath, self.index_filepath)
+
+#%% return data
+    # general log attributes, does not load the log
+    def return_attributes(self, i):
+        return self.general[self.names[i]]
+
+    def return_names(self):
+        return self.names
+
+#%% Logs
+    def run_folderpath(self, name):
+        return os.path.join(self.runs_folder, name)
+
+    # Logs were pickled before the numpy format, these can still be loaded until migrated
+    def pickle_filepath(self, name):
+        return os.path.join(self.runs_folder, name + ".pkl")
+
+    def load(self, name):
+        if not name in self.loaded:
+            if os.path.exists(self.run_folderpath(name)):
+                self.loaded[name] = Log.load(self.run_folderpath(name))
+            else:
+                with open(self.pickle_filepath(name), 'rb') as file:
+                    self.loaded[name] = pickle.load(file)
+        return self.loaded[name]
+
+    # Changes every time the log is written
+    def return_stamp(self, name):
+        if os.path.exists(self.run_folderpath(name)):
+            return os.stat(self.run_folderpath(name)).st_mtime_ns
+        return os.stat(self.pickle_filepath(name)).st_mtime_ns
+
+    # Percentiles and relative error for all files in log, the rest of the log is not loaded
+    def return_summary(self, name):
+        if os.path.exists(self.run_folderpath(name)):
+            return Log.load_summary(self.run_folderpath(name))
+        log = self.load(name)
+        return {key: (np.asarray(log.return_all_agg_data(key), dtype=np.float64), log.return_all_error(key)) for key in log.return_keys()}
+
+    # Log is saved to a temporary folder first so it is never left half written
+    def write(self, name, log):
+        # Memory mapped files of a loaded log must be closed before the folder is replaced
+        self.loaded.pop(name, None)
+
+        temp_folderpath = self.run_folderpath(name) + ".tmp"
+        if os.path.exists(temp_folderpath):
+            shutil.rmtree(temp_folderpath)
+        log.save(temp_folderpath)
+        self.remove(name)
+        os.replace(temp_folderpath, self.run_folderpath(name))
+
+        self.general[name] = log.return_attributes()
+
+    def remove(self, name):
+        self.loaded.pop(name, None)
+        if os.path.exists(self.run_folderpath(name)):
+            shutil.rmtree(self.run_folderpath(name))
+        if os.path.exists(self.pickle_filepath(name)):
+            os.remove(self.pickle_filepath(name))
+
+    # Adds new log without rewriting the other logs
+    def append(self, log):
+        name = log.return_folder_name()
+        self.write(name, log)
+        self.names.append(name)
+        self.save()
+
+    # Sets order of logs to names, writes new_logs and removes logs not in names
+    def update(self, names, new_logs):
+        for name, log in new_logs.items():
+            self.write(name, log)
+
+        for name in set(self.names) - set(names):
+            self.remove(name)
+            self.general.pop(name, None)
+
+        self.names = list(names)
+        self.save()
+
+    # Imports the old file with all logs pickled in one list
+    def import_legacy(self, filepath):
+        with open(filepath, 'rb') as file:
+            data = pickle.load(file)
+
+        self.properties = data[1]
+        self.names = []
+        for log in data[0]:
+            name = log.return_folder_name()
+            self.write(name, log)
+            self.names.append(name)
+        self.save()
+
+    # Rewrites pickled logs in the numpy format, returns number of migrated logs
+    def migrate(self):
+        count = 0
+        for name in self.names:
+            if os.path.exists(self.pickle_filepath(name)):
+                with open(self.pickle_filepath(name), 'rb') as file:
+                    log = pickle.load(file)
+                self.write(name, log)
+                count += 1
+        return count
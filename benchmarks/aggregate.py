@@ -0,0 +1,83 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+# Compares Log.aggregate with the old list based implementation on keys with 1M samples
+# Run from the repository folder: python -O benchmarks/aggregate.py
+
+#%% Standard modules
+import os
+import sys
+import time
+import bisect
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#%% Custom modules
+from Log_class import Log
+
+# Old implementation with Python lists, sort and bisect
+def aggregate_lists(data):
+    aggregated_values = {}
+    outliers = {}
+    for key in data:
+        aggregated_values[key] = list(np.percentile(data[key], [0, 25, 50, 75, 100]))
+        data[key].sort()
+        outliers[key] = []
+
+        Q1 = aggregated_values[key][1]
+        Q3 = aggregated_values[key][3]
+        IQR = Q3 - Q1
+        min_limit = Q1 - 1.5 * IQR
+        if aggregated_values[key][0] < min_limit:
+            aggregated_values[key][0] = min_limit
+            outliers[key].extend(data[key][:bisect.bisect_left(data[key], min_limit)])
+        max_limit = Q3 + 1.5 * IQR
+        if aggregated_values[key][4] > max_limit:
+            aggregated_values[key][4] = max_limit
+            outliers[key].extend(data[key][bisect.bisect_right(data[key], max_limit):])
+    return aggregated_values, outliers
+
+def timed(function, data, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        copy = {key: data[key].copy() for key in data}
+        start = time.perf_counter()
+        result = function(copy)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == "__main__":
+    samples = 1000000
+    repeats = 3
+    rng = np.random.default_rng(0)
+
+    # Loop durations with a few long spikes, like GLOBAL SEARCH
+    keys = {"Loop, Duration (ms)": rng.normal(16, 2, samples) + 50 * (rng.random(samples) < 0.01),
+            "Remap (ms)": rng.gamma(2, 0.2, samples)}
+
+    list_time, (list_agg, list_outliers) = timed(aggregate_lists, {key: keys[key].tolist() for key in keys}, repeats)
+    array_time, (array_agg, array_outliers) = timed(Log.aggregate, keys, repeats)
+
+    for key in keys:
+        assert np.allclose(list_agg[key], array_agg[key])
+        assert np.array_equal(np.sort(list_outliers[key]), array_outliers[key])
+
+    print(f"{len(keys)} keys with {samples} samples, best of {repeats}")
+    print(f"lists:  {list_time:.3f} s")
+    print(f"arrays: {array_time:.3f} s")
+    print(f"speedup: {list_time / array_time:.1f}x")
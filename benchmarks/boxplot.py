@@ -0,0 +1,77 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+# Compares building and drawing a box plot figure with Data.draw_boxes and the old renderer
+# that used one Rectangle, five plot calls and one scatter for every log
+# Run from the repository folder: python -O benchmarks/boxplot.py
+
+#%% Standard modules
+import os
+import sys
+import time
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#%% Classes
+from Data_class import Data
+
+LOGS = 30
+KEYS = 10
+OUTLIERS = 250
+COLORS = {"median": "red", "box": "blue", "outliers": "orange"}
+
+# Old implementation, one artist for every part of every box
+def draw_boxes_old(ax, percentiles, outliers, outlier_counts, colors, label_outliers = True):
+    for j, ((min_val, q1, median, q3, max_val), log_outliers) in enumerate(zip(percentiles, outliers)):
+        box = Rectangle((j - 0.3, q1), 0.3 * 2, q3 - q1, color=colors["box"])
+        ax.add_patch(box)
+        ax.plot([j - 0.45, j + 0.45], [median, median], color=colors["median"], linewidth=2)
+        ax.plot([j, j], [min_val, q1], color="black", linestyle="-")
+        ax.plot([j - 0.3, j + 0.3], [min_val, min_val], color="black", linestyle="-")
+        ax.plot([j, j], [q3, max_val], color="black", linestyle="-")
+        ax.plot([j - 0.3, j + 0.3], [max_val, max_val], color="black", linestyle="-")
+        ax.scatter([j] * len(log_outliers), log_outliers, color=colors["outliers"], label="Outliers" if label_outliers and j == 0 else "")
+
+# Seconds to build figure with all keys and draw it
+def figure_time(draw, data):
+    start = time.perf_counter()
+    fig, axes = plt.subplots(1, KEYS, figsize=(6 * KEYS, 5))
+    for i, (ax, (percentiles, outliers)) in enumerate(zip(axes, data)):
+        draw(ax, percentiles, outliers, [len(array) for array in outliers], COLORS, i == 0)
+        ax.set_xticks(range(LOGS))
+    plt.tight_layout()
+    fig.canvas.draw()
+    plt.close(fig)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    data = []
+    for _ in range(KEYS):
+        percentiles = np.sort(rng.normal(15, 3, (LOGS, 5)), axis=1)
+        outliers = [np.sort(rng.normal(40, 10, OUTLIERS)) for _ in range(LOGS)]
+        data.append((percentiles, outliers))
+
+    for name, draw in [("old", draw_boxes_old), ("collections", Data.draw_boxes)]:
+        times = [figure_time(draw, data) for _ in range(3)]
+        artists = LOGS * 7 if draw is draw_boxes_old else 4
+        print(f"{name:<12} {min(times):.3f} s  ({artists} artists per axis, {LOGS} logs x {KEYS} keys)")
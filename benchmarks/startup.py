@@ -0,0 +1,97 @@
+# Copyright © 2025 Emil Nylander
+
+# This file is part of GulliView logs.
+
+# GulliView logs is free software: you can redistribute it and/or 
+# modify it under the terms of the GNU General Public License 
+# as published by the Free Software Foundation, either version 3 
+# of the License, or (at your option) any later version.
+
+# GulliView logs is distributed in the hope that it will be useful, 
+# but WITHOUT ANY WARRANTY; without even the implied warranty of 
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU 
+# General Public License for more details.
+
+# You should have received a copy of the GNU General Public License 
+# along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
+
+# Measures cold start of the list command and import time of every module imported at startup
+# Exits with 1 if startup is slower than the budget or a module that should be lazy is imported
+# Run from the repository folder: python -O benchmarks/startup.py
+
+#%% Standard modules
+import os
+import sys
+import time
+import json
+import tempfile
+import subprocess
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold start of "main.py list" with an empty store, median of RUNS runs
+# The budget is relative to starting Python and importing numpy, which the store needs,
+# so it does not depend on how fast the computer is
+BUDGET_FACTOR = 1.5
+RUNS = 5
+
+# Modules that are only imported by commands that need them
+LAZY_MODULES = ["matplotlib", "paramiko", "tabulate", "tqdm"]
+
+# Import time in seconds for every module imported by "import Data_class"
+# Lines from -X importtime are "import time: self [us] | cumulative | imported package"
+def import_times(cwd):
+    output = subprocess.run([sys.executable, "-O", "-X", "importtime", "-c", "import Data_class"],
+                            cwd=cwd, env=dict(os.environ, PYTHONPATH=REPOSITORY),
+                            capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+# Median seconds to run Python with arguments
+def run_time(arguments, cwd):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-O", *arguments], cwd=cwd,
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folderpath:
+        # data_folder is absolute since a relative one is relative to the repository, not to config.ini
+        data_folder = os.path.join(folderpath, "data")
+        with open(os.path.join(folderpath, "config.ini"), "w") as file:
+            file.write("[SSH]\nhost = localhost\nuser = user\npassword = password\nfolder = logs\n\n"
+                       f"[General]\nlog_filename = general.log\ndata_folder = {data_folder}\n")
+        os.makedirs(data_folder)
+
+        # First run creates the empty store so the timed runs only read it
+        subprocess.run([sys.executable, "-O", os.path.join(REPOSITORY, "main.py"), "list"], cwd=folderpath,
+                       stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        with open(os.path.join(data_folder, "store", "index.json"), encoding="utf-8") as file:
+            assert json.load(file)["runs"] == [], "store used by benchmark is not empty"
+
+        times = import_times(folderpath)
+        # Only top level modules, submodules are included in their package
+        print("Slowest imports (cumulative):")
+        top_level = [(name, seconds) for name, seconds in times.items() if not "." in name]
+        for name, seconds in sorted(top_level, key=lambda item: item[1], reverse=True)[:15]:
+            print(f"  {name:<30} {seconds * 1000:7.1f} ms")
+
+        imported = [module for module in LAZY_MODULES if module in times]
+        if imported:
+            print("Imported at startup but should be lazy:", ", ".join(imported))
+
+        baseline = run_time(["-c", "import numpy"], folderpath)
+        startup = run_time([os.path.join(REPOSITORY, "main.py"), "list"], folderpath)
+        budget = BUDGET_FACTOR * baseline
+        print(f"\nPython with numpy: {baseline * 1000:.0f} ms")
+        print(f"main.py list:      {startup * 1000:.0f} ms, budget {budget * 1000:.0f} ms")
+
+    sys.exit(1 if imported or startup > budget else 0)
@@ -16,7 +16,13 @@
 # along with GulliView logs. If not, see <https://www.gnu.org/licenses/>.
 
 #%% Standard modules
-from tabulate import tabulate
+import datetime as dt
+import os
+import io
+import gzip
+import shutil
+import sys
+from collections import OrderedDict
 
 #%% Command handler
 def run_command(commands, menupath = "path: start"):
@@ -131,14 +137,17 @@ def input_int(high, prompt, allow_zero = False):
         break
     return number
 
-# Press enter to continue
+# Press enter to continue, does not wait when run from a script
 def user_acknowledge(msg):
     print(msg)
+    if not sys.stdin or not sys.stdin.isatty():
+        return
     print("Press enter to continue...")
     input()  # Waits for user input before proceeding
 
 # Returns dict as a string looking like a table
 def tabulate_dict(data, headers = [], tablefmt = 'rounded_grid'):
+    from tabulate import tabulate
     array = []
     for key in data:
         array.append([key, data[key]])
@@ -151,4 +160,118 @@ def try_int_float_convert(value):
         else:
             return int(value)
     except ValueError:
-        return value
\ No newline at end of file
+        return value
+
+# TIME is the only value in general data that is not supported by json
+def encode_general(general_data):
+    encoded = dict(general_data)
+    if isinstance(encoded.get("TIME"), dt.datetime):
+        encoded["TIME"] = encoded["TIME"].strftime("%Y-%m-%d %H:%M:%S")
+    return encoded
+
+def decode_general(encoded):
+    general_data = dict(encoded)
+    try:
+        general_data["TIME"] = dt.datetime.strptime(general_data["TIME"], "%Y-%m-%d %H:%M:%S")
+    except (KeyError, ValueError):
+        pass
+    return general_data
+
+# Least recently used cache for numpy arrays, limited by the total size of the arrays in MB
+class LRUCache:
+    def __init__(self, max_mb):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.size = 0
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if not key in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, array):
+        if key in self.items:
+            self.size -= self.items.pop(key).nbytes
+        if array.nbytes > self.max_bytes:
+            return
+
+        self.items[key] = array
+        self.size += array.nbytes
+
+        # Remove least recently used arrays until it fits
+        while self.size > self.max_bytes:
+            _, removed = self.items.popitem(last=False)
+            self.size -= removed.nbytes
+
+    def remove(self, key):
+        if key in self.items:
+            self.size -= self.items.pop(key).nbytes
+
+#%% Compressed log files
+# File endings for compression formats that log files can be archived with
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+# Name of log file without compression ending
+def log_name(filename):
+    for extension in COMPRESSION_EXTENSIONS.values():
+        if filename.endswith(extension):
+            return filename[:-len(extension)]
+    return filename
+
+# Path to log file in folder, compressed or not
+def find_log(folderpath, filename):
+    for extension in ["", *COMPRESSION_EXTENSIONS.values()]:
+        filepath = os.path.join(folderpath, filename + extension)
+        if os.path.exists(filepath):
+            return filepath
+    return os.path.join(folderpath, filename)
+
+# Opens log file as text, or bytes if binary, compressed files are decompressed while reading
+def open_log(filepath, binary = False):
+    if filepath.endswith(COMPRESSION_EXTENSIONS["gzip"]):
+        return gzip.open(filepath, "rb") if binary else gzip.open(filepath, "rt", encoding="utf-8")
+    if filepath.endswith(COMPRESSION_EXTENSIONS["zstd"]):
+        import zstandard # Optional, only needed for zstd archives
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"), closefd=True)
+        return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+    return open(filepath, "rb") if binary else open(filepath, "r", encoding="utf-8")
+
+# Compresses file and removes the original, mtime is kept, returns path of compressed file
+def compress_log(filepath, compression):
+    compressed_filepath = filepath + COMPRESSION_EXTENSIONS[compression]
+    with open(filepath, "rb") as source:
+        if compression == "gzip":
+            with gzip.open(compressed_filepath, "wb") as target:
+                shutil.copyfileobj(source, target)
+        else:
+            import zstandard # Optional, only needed for zstd archives
+            with open(compressed_filepath, "wb") as target:
+                zstandard.ZstdCompressor(level=10).copy_stream(source, target)
+
+    stat = os.stat(filepath)
+    os.utime(compressed_filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.remove(filepath)
+    return compressed_filepath
+#%% Log folders
+# Index files made by LineIndex are saved beside the log files
+INDEX_EXTENSION = ".idx.npz"
+
+# Files in log folder without index files
+def log_filenames(folderpath):
+    return [filename for filename in os.listdir(folderpath) if not filename.endswith(INDEX_EXTENSION)]
+
+#%% Growing log files
+# Offset just after the last complete line in file, searched backwards to start
+# The last line may still be written to if the file is growing
+def line_end(filepath, start = 0, chunk_size = 1 << 16):
+    with open(filepath, "rb") as file:
+        end = file.seek(0, os.SEEK_END)
+        while end > start:
+            position = max(start, end - chunk_size)
+            file.seek(position)
+            newline = file.read(end - position).rfind(b"\n")
+            if newline >= 0:
+                return position + newline + 1
+            end = position
+    return start
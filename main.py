@@ -17,17 +17,112 @@
 
 #%% Standard modules
 import os
+import sys
+import argparse
 
-#%% Custom modules
-from Data_class import Data
-from functions import run_command
+#%% Command line
+# Without a command the menu is started, commands can be used from scripts or cron
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description="Fetch, import and plot GulliView logs. Without a command the menu is started.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
 
-# Clear terminal
-# Windows (cls) or Linux/macOS (clear)
-os.system('cls' if os.name == 'nt' else 'clear')
+    subparsers.add_parser("fetch", help="download new logs from the GulliView computer and import them")
 
-data = Data()
+    reimport = subparsers.add_parser("reimport", help="import logs in archive that changed")
+    reimport.add_argument("--full", action="store_true", help="import all logs again")
 
-while True:
-    if run_command(data.returnCommands()):
-        break
\ No newline at end of file
+    subparsers.add_parser("list", help="print all imported logs with their IDs")
+
+    boxplot = subparsers.add_parser("boxplot", help="box plot of keys for all cameras in logs")
+    timeline = subparsers.add_parser("timeline", help="timeline of keys for one camera file in logs")
+    stages = subparsers.add_parser("stages", help="stacked time of stage keys for frames sorted by loop duration in one camera file")
+    for plot in [boxplot, timeline, stages]:
+        plot.add_argument("--ids", type=int, nargs="+", required=True, help="IDs of logs as shown by list")
+        plot.add_argument("--keys", nargs="+", required=True, help="keys to plot, for example 'Loop, Duration (ms)'")
+        plot.add_argument("--output", "-o", help="save plot to this file instead of showing it")
+    for plot in [timeline, stages]:
+        plot.add_argument("--file", required=True, help="camera file to plot, for example camera_0_output-fast.log")
+
+    report = subparsers.add_parser("report", help="save box plots and timelines of keys in logs as images with an index.html")
+    report.add_argument("--ids", type=int, nargs="+", required=True, help="IDs of logs as shown by list")
+    report.add_argument("--keys", nargs="+", required=True, help="keys to plot, for example 'Loop, Duration (ms)'")
+    report.add_argument("--format", choices=["png", "svg"], help="image format, default report_format in config.ini")
+    report.add_argument("--workers", type=int, help="processes drawing figures, default import_workers in config.ini")
+    report.add_argument("--output", "-o", help="folder for report, default report_folder in config.ini")
+
+    export = subparsers.add_parser("export", help="write percentiles of all cameras as csv")
+    export.add_argument("--ids", type=int, nargs="+", help="IDs of logs as shown by list, default all")
+    export.add_argument("--where", nargs="+", default=[], help="conditions on general data, for example VERSION=VT25.1 FPS>=30")
+    export.add_argument("--keys", default="*", help="key patterns separated by ';', * matches any text, default all keys")
+    export.add_argument("--output", "-o", help="csv file, default prints to terminal")
+
+    dataset = subparsers.add_parser("dataset", help="write timelines, percentiles and outliers of logs changed since the last export as parquet or arrow files")
+    dataset.add_argument("--format", choices=["parquet", "arrow"], help="file format, default dataset_format in config.ini")
+    dataset.add_argument("--output", "-o", help="folder for dataset, default dataset_folder in config.ini")
+
+    return parser, parser.parse_args(arguments)
+
+# Runs command from arguments, returns exit code
+def run_arguments(parser, arguments):
+    # Only modules for the command are imported
+    from Data_class import Data
+    data = Data(sys.stderr)  # stdout only gets the output of the command
+
+    if arguments.command == "fetch":
+        return 1 if data.fetch_new_logs() else 0
+
+    if arguments.command == "reimport":
+        data.reimport_all(arguments.full)
+    elif arguments.command == "list":
+        data.print_all()
+
+    elif arguments.command in ["boxplot", "timeline", "stages", "report"]:
+        for ID in arguments.ids:
+            if not 1 <= ID <= len(data.store):
+                parser.error(f"ID {ID} not found, there are {len(data.store)} logs")
+        if arguments.command == "report":
+            data.create_report(arguments.ids, arguments.keys, arguments.output, arguments.format, arguments.workers)
+            return 0
+        if arguments.output:
+            import matplotlib
+            matplotlib.use("Agg") # Plots are only saved so no window is needed
+        comp = [data.store[ID - 1] for ID in arguments.ids]
+
+        if arguments.command == "boxplot":
+            data.display_combined(comp, arguments.keys, arguments.output)
+        elif arguments.command == "timeline":
+            data.display_timeline(comp, arguments.keys, arguments.file, arguments.output)
+        else:
+            data.display_stages(comp, arguments.keys, arguments.file, arguments.output)
+
+    elif arguments.command == "export":
+        from Query_class import Query
+        try:
+            conditions = [Query.parse_condition(condition) for condition in arguments.where]
+        except ValueError as e:
+            parser.error(str(e))
+        count = data.export_table(conditions, arguments.keys, arguments.ids, arguments.output)
+        if arguments.output:
+            print(count, "rows written to", arguments.output)
+    elif arguments.command == "dataset":
+        data.export_dataset(arguments.output, arguments.format)
+    return 0
+
+# Guard is needed since worker processes used for importing re-import this file on Windows
+if __name__ == "__main__":
+    parser, arguments = parse_arguments(sys.argv[1:])
+    if arguments.command:
+        sys.exit(run_arguments(parser, arguments))
+
+    from Data_class import Data
+    from functions import run_command
+
+    # Clear terminal
+    # Windows (cls) or Linux/macOS (clear)
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+    data = Data()
+
+    while True:
+        if run_command(data.returnCommands()):
+            break